@@ -14,10 +14,14 @@ from aws_cdk import (
     aws_logs as logs,
     aws_ecr_assets as ecr_assets,
     aws_cloudwatch as cloudwatch,
-    aws_secretsmanager as secretsmanager
+    aws_cloudwatch_actions as cloudwatch_actions,
+    aws_secretsmanager as secretsmanager,
+    aws_sqs as sqs,
+    aws_lambda_event_sources as lambda_event_sources,
+    aws_applicationautoscaling as appscaling
 )
 from constructs import Construct
-import platform
+from deploy_time_build import SociIndexBuild
 
 class PDFAccessibility(Stack):
     def __init__(self, scope: Construct, construct_id: str, **kwargs) -> None:
@@ -25,15 +29,52 @@ class PDFAccessibility(Stack):
         
         # S3 Bucket
         bucket = s3.Bucket(self, "pdfaccessibilitybucket1", encryption=s3.BucketEncryption.S3_MANAGED, enforce_ssl=True)
+        # Bucket layout: uploads land under pdf/, intermediate files for a run under temp/<name>/,
+        # and finished PDFs under result/. Each role only gets the prefixes it touches.
+        upload_objects = "pdf/*"
+        work_objects = "temp/*"
+        result_objects = "result/*"
+
+        # Every component log group keeps a week of logs and goes away with the stack
+        def component_log_group(log_group_id, **log_group_kwargs):
+            return logs.LogGroup(self, log_group_id,
+                                 retention=logs.RetentionDays.ONE_WEEK,
+                                 removal_policy=cdk.RemovalPolicy.DESTROY,
+                                 **log_group_kwargs)
     
 
+        # Deploy with `-c docker_cache_repo=<ecr repository uri>` to share BuildKit layer caches between
+        # machines, so unchanged layers are pulled from the registry instead of rebuilt. Exporting a registry
+        # cache needs a docker-container buildx builder, and ECR only accepts it as an OCI image manifest.
+        docker_cache_repo = self.node.try_get_context("docker_cache_repo")
+
+        def docker_cache_options(cache_tag):
+            if not docker_cache_repo:
+                return {}
+            cache_ref = f"{docker_cache_repo}:{cache_tag}"
+            return {
+                "cache_from": [ecr_assets.DockerCacheOption(type="registry", params={"ref": cache_ref})],
+                "cache_to": ecr_assets.DockerCacheOption(type="registry", params={
+                    "ref": cache_ref,
+                    "mode": "max",
+                    "image-manifest": "true",
+                    "oci-mediatypes": "true",
+                }),
+            }
+
         python_image_asset = ecr_assets.DockerImageAsset(self, "PythonImage",
                                                          directory="docker_autotag",
-                                                        platform=ecr_assets.Platform.LINUX_AMD64)
+                                                        platform=ecr_assets.Platform.LINUX_ARM64,
+                                                        **docker_cache_options("autotag"))
 
         javascript_image_asset = ecr_assets.DockerImageAsset(self, "JavaScriptImage",
                                                              directory="javascript_docker",
-                                                             platform=ecr_assets.Platform.LINUX_AMD64)
+                                                             platform=ecr_assets.Platform.LINUX_ARM64,
+                                                             **docker_cache_options("alt-text"))
+
+        # SOCI indexes let Fargate lazy-load image layers instead of pulling the whole image before start
+        SociIndexBuild.from_docker_image_asset(self, "PythonImageSociIndex", python_image_asset)
+        SociIndexBuild.from_docker_image_asset(self, "JavaScriptImageSociIndex", javascript_image_asset)
         # VPC with Public and Private Subnets
         vpc = ec2.Vpc(self, "MyVpc",
             max_azs=2,
@@ -51,9 +92,21 @@ class PDFAccessibility(Stack):
                 ),
             ]
         )
+        # Keep the Fargate workers' AWS traffic (image layers, S3, Bedrock, queues, logs) off the NAT gateway.
+        # The NAT gateway stays for the Adobe PDF Services API. ECR layer bytes are served from S3 through the
+        # gateway endpoint, so only the small ECR API calls use the NAT gateway.
+        vpc.add_gateway_endpoint("S3Endpoint", service=ec2.GatewayVpcEndpointAwsService.S3)
+        for endpoint_id, endpoint_service in [
+            ("BedrockRuntimeEndpoint", ec2.InterfaceVpcEndpointAwsService.BEDROCK_RUNTIME),
+            ("SecretsManagerEndpoint", ec2.InterfaceVpcEndpointAwsService.SECRETS_MANAGER),
+            ("CloudWatchLogsEndpoint", ec2.InterfaceVpcEndpointAwsService.CLOUDWATCH_LOGS),
+            ("SqsEndpoint", ec2.InterfaceVpcEndpointAwsService.SQS),
+            ("StepFunctionsEndpoint", ec2.InterfaceVpcEndpointAwsService.STEP_FUNCTIONS),
+        ]:
+            vpc.add_interface_endpoint(endpoint_id, service=endpoint_service)
 
         # ECS Cluster
-        cluster = ecs.Cluster(self, "FargateCluster", vpc=vpc)
+        cluster = ecs.Cluster(self, "FargateCluster", vpc=vpc, enable_fargate_capacity_providers=True)
 
         ecs_task_execution_role = iam.Role(self, "EcsTaskRole",
                                  assumed_by=iam.ServicePrincipal("ecs-tasks.amazonaws.com"),
@@ -64,190 +117,376 @@ class PDFAccessibility(Stack):
         # Allow ECS Task Role to access Bedrock services
         account_id = Stack.of(self).account
         region = Stack.of(self).region
+        # The Adobe client credentials read by the autotag task and both accessibility checkers.
+        # Secrets Manager appends a random suffix to secret ARNs
+        client_credentials_policy = iam.PolicyStatement(
+            actions=["secretsmanager:GetSecretValue"],
+            resources=[f"arn:aws:secretsmanager:{region}:{account_id}:secret:/myapp/client_credentials*"]
+        )
         
         ecs_task_role = iam.Role(self, "EcsTaskExecutionRole",
             assumed_by=iam.ServicePrincipal("ecs-tasks.amazonaws.com"),
             managed_policies=[
                 iam.ManagedPolicy.from_aws_managed_policy_name("service-role/AmazonECSTaskExecutionRolePolicy"),
-                iam.ManagedPolicy.from_aws_managed_policy_name("SecretsManagerReadWrite")  # Add this line
             ]
         )
+        bucket.grant_read_write(ecs_task_role, work_objects)
+        ecs_task_role.add_to_policy(client_credentials_policy)
+        # The autotag container detects the document language with Comprehend
         ecs_task_role.add_to_policy(iam.PolicyStatement(
-            actions=["bedrock:*"],  # Adjust based on the specific Bedrock actions required
+            actions=["comprehend:DetectDominantLanguage"],
             resources=["*"],
         ))
-        ecs_task_role.add_to_policy(iam.PolicyStatement(
-            actions=["s3:*"],  # This gives access to all S3 actions
-            resources=["*"],   # This applies the actions to all resources
-        ))
-        ecs_task_role.add_to_policy(iam.PolicyStatement(actions=
-                                                        ["secretsmanager:GetSecretValue"], 
-                                                         resources=[f"arn:aws:secretsmanager:{region}:{account_id}:secret:/myapp/db_credentials"] )
-                                                         )
-        # Grant S3 read/write access to ECS Task Role
-        bucket.grant_read_write(ecs_task_execution_role)
+        # Bedrock batch inference for image-heavy chunks is off by default: a batch job can take far longer than
+        # on-demand calls, and the alt text worker holds the chunk while it waits. Deploy with
+        # `-c bedrock_batch=true` for offline or bulk runs where cost matters more than latency.
+        bedrock_batch = str(self.node.try_get_context("bedrock_batch")).lower() == "true"
+        bedrock_batch_role = None
+        if bedrock_batch:
+            # Service role Bedrock assumes to read batch inference input from and write output to the bucket
+            bedrock_batch_role = iam.Role(self, "BedrockBatchInferenceRole",
+                assumed_by=iam.ServicePrincipal("bedrock.amazonaws.com"),
+            )
+            bucket.grant_read_write(bedrock_batch_role, work_objects)
+            ecs_task_role.add_to_policy(iam.PolicyStatement(
+                actions=["bedrock:CreateModelInvocationJob", "bedrock:GetModelInvocationJob", "bedrock:StopModelInvocationJob"],
+                resources=["*"],
+            ))
+            bedrock_batch_role.grant_pass_role(ecs_task_role)
         # Create ECS Task Log Groups explicitly
-        python_container_log_group = logs.LogGroup(self, "PythonContainerLogGroup",
-                                                log_group_name="/ecs/MyFirstTaskDef/python_container",
-                                                retention=logs.RetentionDays.ONE_WEEK,
-                                                removal_policy=cdk.RemovalPolicy.DESTROY)
-
-        javascript_container_log_group = logs.LogGroup(self, "JavaScriptContainerLogGroup",
-                                                    log_group_name="/ecs/MySecondTaskDef/javascript_container",
-                                                    retention=logs.RetentionDays.ONE_WEEK,
-                                                    removal_policy=cdk.RemovalPolicy.DESTROY)
-        # ECS Task Definitions
-        task_definition_1 = ecs.FargateTaskDefinition(self, "MyFirstTaskDef",
-                                                      memory_limit_mib=1024,
-                                                      cpu=256, execution_role=ecs_task_execution_role, task_role=ecs_task_role,
-                                                     )
-
-        container_definition_1 = task_definition_1.add_container("python_container",
-                                                                  image=ecs.ContainerImage.from_registry(python_image_asset.image_uri),
-                                                                  memory_limit_mib=1024,
-                                                                  logging=ecs.LogDrivers.aws_logs(
-        stream_prefix="PythonContainerLogs",
-        log_group=python_container_log_group,
-    ))
-
-        task_definition_2 = ecs.FargateTaskDefinition(self, "MySecondTaskDef",
-                                                      memory_limit_mib=1024,
-                                                      cpu=256, execution_role=ecs_task_execution_role, task_role=ecs_task_role,
-                                                      )
-
-        container_definition_2 = task_definition_2.add_container("javascript_container",
-                                                                  image=ecs.ContainerImage.from_registry(javascript_image_asset.image_uri),
-                                                                  memory_limit_mib=1024,
-                                                                   logging=ecs.LogDrivers.aws_logs(
-        stream_prefix="JavaScriptContainerLogs",
-        log_group=javascript_container_log_group
-    ))
+        python_container_log_group = component_log_group("PythonContainerLogGroup",
+                                                         log_group_name="/ecs/MyFirstTaskDef/python_container")
+
+        javascript_container_log_group = component_log_group("JavaScriptContainerLogGroup",
+                                                             log_group_name="/ecs/MySecondTaskDef/javascript_container")
         model_id_image = 'us.anthropic.claude-3-5-sonnet-20241022-v2:0'
         model_id_link = 'us.anthropic.claude-3-haiku-20240307-v1:0'
         model_arn_image = f'arn:aws:bedrock:{region}:{account_id}:inference-profile/{model_id_image}'
         model_arn_link = f'arn:aws:bedrock:{region}:{account_id}:inference-profile/{model_id_link}'
-        # ECS Tasks in Step Functions
-        ecs_task_1 = tasks.EcsRunTask(self, "ECS RunTask",
-                                      integration_pattern=sfn.IntegrationPattern.RUN_JOB,
-                                      cluster=cluster,
-                                      task_definition=task_definition_1,
-                                      assign_public_ip=False,
-                                      
-                                      container_overrides=[tasks.ContainerOverride(
-                                       container_definition = container_definition_1,
-                                          environment=[
-                                              tasks.TaskEnvironmentVariable(
-                                                  name="S3_BUCKET_NAME",
-                                                  value=sfn.JsonPath.string_at("$.s3_bucket")
-                                              ),
-                                              tasks.TaskEnvironmentVariable(
-                                                  name="S3_FILE_KEY",
-                                                  value=sfn.JsonPath.string_at("$.s3_key")
-                                              ),
-                                              tasks.TaskEnvironmentVariable(
-                                                  name="S3_CHUNK_KEY",
-                                                  value=sfn.JsonPath.string_at("$.chunk_key")
-                                              ),
-                                            tasks.TaskEnvironmentVariable(
-                                                  name="model_arn_image",
-                                                  value=model_arn_image
-                                              ),
-                                            tasks.TaskEnvironmentVariable(
-                                                  name="model_arn_link",
-                                                  value=model_arn_link
-                                              ),
-                                          ]
-                                      )],
-                                      launch_target=tasks.EcsFargateLaunchTarget(
-                                          platform_version=ecs.FargatePlatformVersion.LATEST
-                                      ),
-                                      propagated_tag_source=ecs.PropagatedTagSource.TASK_DEFINITION,
-                                     )
-
-        ecs_task_2 = tasks.EcsRunTask(self, "ECS RunTask (1)",
-                                      integration_pattern=sfn.IntegrationPattern.RUN_JOB,
-                                      cluster=cluster,
-                                      task_definition=task_definition_2,
-                                      assign_public_ip=False,
-                                    
-                                      container_overrides=[tasks.ContainerOverride(
-                                          container_definition=container_definition_2,
-                                          environment=[
-                                              tasks.TaskEnvironmentVariable(
-                                                  name="S3_BUCKET_NAME",
-                                                  value=sfn.JsonPath.string_at("$.Overrides.ContainerOverrides[0].Environment[0].Value")
-                                              ),
-                                              tasks.TaskEnvironmentVariable(
-                                                  name="S3_FILE_KEY",
-                                                  value=sfn.JsonPath.string_at("$.Overrides.ContainerOverrides[0].Environment[1].Value")
-                                              ),
-                                          ]
-                                      )],
-                                      launch_target=tasks.EcsFargateLaunchTarget(
-                                          platform_version=ecs.FargatePlatformVersion.LATEST
-                                      ),
-                                      propagated_tag_source=ecs.PropagatedTagSource.TASK_DEFINITION,
-                                      )
-
-        # Step Function Map State
-        map_state = sfn.Map(self, "Map",
-                            max_concurrency=100,
-                            items_path=sfn.JsonPath.string_at("$.chunks"),
+        # Cross-region inference profiles also need invoke access on the underlying foundation models
+        ecs_task_role.add_to_policy(iam.PolicyStatement(
+            actions=["bedrock:InvokeModel", "bedrock:InvokeModelWithResponseStream", "bedrock:Converse", "bedrock:ConverseStream"],
+            resources=[
+                model_arn_image,
+                model_arn_link,
+                f"arn:aws:bedrock:*::foundation-model/{model_id_image.split('.', 1)[1]}",
+                f"arn:aws:bedrock:*::foundation-model/{model_id_link.split('.', 1)[1]}",
+            ],
+        ))
+        # Deploy with `-c bedrock_provisioned_image_model_arn=<provisioned model arn>` to send the on-demand alt text
+        # calls to purchased Provisioned Throughput instead of the rate-limited on-demand quota
+        bedrock_provisioned_image_model_arn = self.node.try_get_context("bedrock_provisioned_image_model_arn") or ""
+        if bedrock_provisioned_image_model_arn:
+            ecs_task_role.add_to_policy(iam.PolicyStatement(
+                actions=["bedrock:InvokeModel", "bedrock:InvokeModelWithResponseStream"],
+                resources=[bedrock_provisioned_image_model_arn],
+            ))
+        # Bedrock latency-optimized inference for the alt text and title generation calls
+        bedrock_performance_config = "optimized"
+
+        # Chunk work queues. The Map enqueues each chunk with a task token; the autotag worker
+        # forwards it to the alt text queue, and the alt text worker reports the result to Step Functions.
+        # A message is only redelivered if a worker dies mid-chunk (e.g. OOM kill).
+        chunk_worker_visibility_timeout = Duration.minutes(30)
+        # With bedrock_batch enabled, the longest the alt text worker waits on a Bedrock batch job before stopping
+        # it and falling back to on-demand calls. Kept below the visibility timeout (the worker also extends visibility while it
+        # holds a chunk) and well below the state machine timeout.
+        bedrock_batch_max_wait = Duration.minutes(20)
+        # A Spot interruption hands the chunk back to the queue and counts as a receive, so allow one more than
+        # a single retry before a chunk is parked in the DLQ
+        chunk_worker_max_receive_count = 3
+        autotag_dlq = sqs.Queue(self, "AutotagChunkDLQ")
+        alt_text_dlq = sqs.Queue(self, "AltTextChunkDLQ")
+        autotag_queue = sqs.Queue(self, "AutotagChunkQueue",
+                                  visibility_timeout=chunk_worker_visibility_timeout,
+                                  dead_letter_queue=sqs.DeadLetterQueue(
+                                      max_receive_count=chunk_worker_max_receive_count,
+                                      queue=autotag_dlq))
+        alt_text_queue = sqs.Queue(self, "AltTextChunkQueue",
+                                   visibility_timeout=chunk_worker_visibility_timeout,
+                                   dead_letter_queue=sqs.DeadLetterQueue(
+                                       max_receive_count=chunk_worker_max_receive_count,
+                                       queue=alt_text_dlq))
+        autotag_queue.grant_consume_messages(ecs_task_role)
+        alt_text_queue.grant_send_messages(ecs_task_role)
+        alt_text_queue.grant_consume_messages(ecs_task_role)
+
+        # ECS Task Definition
+        # Each worker task runs both containers as long-lived queue consumers. They share a task volume,
+        # so the alt text container can skip the S3 download when it picks up a chunk autotagged in the same task.
+        shared_volume_name = "shared"
+        shared_volume_path = "/shared"
+        task_definition = ecs.FargateTaskDefinition(self, "MyChunkTaskDef",
+                                                    memory_limit_mib=6144,
+                                                    cpu=2048, execution_role=ecs_task_execution_role, task_role=ecs_task_role,
+                                                    # Both images are built for arm64 and run on Graviton
+                                                    runtime_platform=ecs.RuntimePlatform(
+                                                        cpu_architecture=ecs.CpuArchitecture.ARM64,
+                                                        operating_system_family=ecs.OperatingSystemFamily.LINUX,
+                                                    ),
+                                                    )
+        task_definition.add_volume(name=shared_volume_name)
+
+        # Container output goes through a Fluent Bit (FireLens) sidecar, which buffers and batches it into
+        # the same log groups, instead of the awslogs driver writing from each container
+        log_router_log_group = component_log_group("LogRouterLogGroup", log_group_name="/ecs/MyChunkTaskDef/log_router")
+        # The log router image is pulled from public ECR through a pull-through cache in the account's private
+        # registry, so its layers come through the S3 gateway endpoint instead of the NAT gateway
+        ecr_public_cache_prefix = "ecr-public"
+        ecr.CfnPullThroughCacheRule(self, "EcrPublicPullThroughCache",
+                                    ecr_repository_prefix=ecr_public_cache_prefix,
+                                    upstream_registry_url="public.ecr.aws")
+        ecs_task_execution_role.add_to_policy(iam.PolicyStatement(
+            actions=["ecr:CreateRepository", "ecr:BatchImportUpstreamImage"],
+            resources=[f"arn:aws:ecr:{region}:{account_id}:repository/{ecr_public_cache_prefix}/*"],
+        ))
+        task_definition.add_firelens_log_router("log_router",
+                                                image=ecs.ContainerImage.from_registry(
+                                                    f"{account_id}.dkr.ecr.{region}.amazonaws.com/{ecr_public_cache_prefix}/aws-observability/aws-for-fluent-bit:stable"),
+                                                firelens_config=ecs.FirelensConfig(type=ecs.FirelensLogRouterType.FLUENTBIT),
+                                                memory_reservation_mib=50,
+                                                logging=ecs.LogDrivers.aws_logs(
+            stream_prefix="LogRouter",
+            log_group=log_router_log_group,
+        ))
+        python_container_log_group.grant_write(ecs_task_role)
+        javascript_container_log_group.grant_write(ecs_task_role)
+
+        def firelens_cloudwatch_logs(log_group, stream_prefix):
+            return ecs.LogDrivers.firelens(options={
+                "Name": "cloudwatch_logs",
+                "region": region,
+                "log_group_name": log_group.log_group_name,
+                "log_stream_prefix": f"{stream_prefix}/",
+                "auto_create_group": "false",
+                # Ship the log line as written instead of Fluent Bit's JSON record wrapper
+                "log_key": "log",
+            })
+
+        container_definition_1 = task_definition.add_container("python_container",
+                                                                image=ecs.ContainerImage.from_registry(python_image_asset.image_uri),
+                                                                environment={
+                                                                    "SHARED_DIR": shared_volume_path,
+                                                                    "CHUNK_QUEUE_URL": autotag_queue.queue_url,
+                                                                    "NEXT_QUEUE_URL": alt_text_queue.queue_url,
+                                                                    "CHUNK_VISIBILITY_TIMEOUT_SECONDS": str(int(chunk_worker_visibility_timeout.to_seconds())),
+                                                                },
+                                                                logging=firelens_cloudwatch_logs(python_container_log_group, "PythonContainerLogs"))
+
+        container_definition_2 = task_definition.add_container("javascript_container",
+                                                                image=ecs.ContainerImage.from_registry(javascript_image_asset.image_uri),
+                                                                environment={
+                                                                    "SHARED_DIR": shared_volume_path,
+                                                                    "CHUNK_QUEUE_URL": alt_text_queue.queue_url,
+                                                                    "model_arn_image": model_arn_image,
+                                                                    "model_arn_link": model_arn_link,
+                                                                    "BEDROCK_PERFORMANCE_CONFIG": bedrock_performance_config,
+                                                                    # Empty unless batch inference is enabled, which keeps every chunk on on-demand calls
+                                                                    "BEDROCK_BATCH_ROLE_ARN": bedrock_batch_role.role_arn if bedrock_batch_role else "",
+                                                                    "BEDROCK_BATCH_THRESHOLD": "100",
+                                                                    "BEDROCK_BATCH_MAX_WAIT_SECONDS": str(int(bedrock_batch_max_wait.to_seconds())),
+                                                                    "CHUNK_VISIBILITY_TIMEOUT_SECONDS": str(int(chunk_worker_visibility_timeout.to_seconds())),
+                                                                    "BEDROCK_MAX_CONCURRENCY": "10",
+                                                                    "BEDROCK_BATCH_SIZE": "4",
+                                                                    "BEDROCK_PROVISIONED_IMAGE_MODEL_ARN": bedrock_provisioned_image_model_arn,
+                                                                },
+                                                                logging=firelens_cloudwatch_logs(javascript_container_log_group, "JavaScriptContainerLogs"))
+        for container in (container_definition_1, container_definition_2):
+            container.add_mount_points(ecs.MountPoint(source_volume=shared_volume_name,
+                                                      container_path=shared_volume_path,
+                                                      read_only=False))
+
+        # Worker service, scaled on the chunks waiting in or held by either queue so that
+        # it only drops to zero once no chunk is being worked on
+        # Chunks are idempotent and requeued on interruption, so most workers can run on Spot. Deploy with
+        # `-c chunk_worker_spot=true` where the region offers Fargate Spot for ARM64 tasks
+        chunk_worker_capacity = [ecs.CapacityProviderStrategy(capacity_provider="FARGATE", weight=1)]
+        if str(self.node.try_get_context("chunk_worker_spot")).lower() == "true":
+            chunk_worker_capacity.append(ecs.CapacityProviderStrategy(capacity_provider="FARGATE_SPOT", weight=4))
+        chunk_worker_service = ecs.FargateService(self, "ChunkWorkerService",
+                                                  cluster=cluster,
+                                                  task_definition=task_definition,
+                                                  desired_count=0,
+                                                  assign_public_ip=False,
+                                                  enable_execute_command=False,
+                                                  # SOCI lazy loading needs platform version 1.4.0 or later
+                                                  platform_version=ecs.FargatePlatformVersion.VERSION1_4,
+                                                  propagate_tags=ecs.PropagatedTagSource.TASK_DEFINITION,
+                                                  min_healthy_percent=0,
+                                                  capacity_provider_strategies=chunk_worker_capacity,
+                                                  )
+        # Scale out on chunks still waiting to be picked up. Scale in only once nothing is waiting or in flight:
+        # shrinking the service while workers hold chunks would stop tasks mid-chunk.
+        chunks_waiting = cloudwatch.MathExpression(
+            expression="autotag_visible + alt_text_visible",
+            using_metrics={
+                "autotag_visible": autotag_queue.metric_approximate_number_of_messages_visible(period=Duration.minutes(1)),
+                "alt_text_visible": alt_text_queue.metric_approximate_number_of_messages_visible(period=Duration.minutes(1)),
+            },
+            period=Duration.minutes(1),
+        )
+        chunks_outstanding = cloudwatch.MathExpression(
+            expression="autotag_visible + autotag_in_flight + alt_text_visible + alt_text_in_flight",
+            using_metrics={
+                "autotag_visible": autotag_queue.metric_approximate_number_of_messages_visible(period=Duration.minutes(1)),
+                "autotag_in_flight": autotag_queue.metric_approximate_number_of_messages_not_visible(period=Duration.minutes(1)),
+                "alt_text_visible": alt_text_queue.metric_approximate_number_of_messages_visible(period=Duration.minutes(1)),
+                "alt_text_in_flight": alt_text_queue.metric_approximate_number_of_messages_not_visible(period=Duration.minutes(1)),
+            },
+            period=Duration.minutes(1),
+        )
+        chunk_worker_scaling = chunk_worker_service.auto_scale_task_count(min_capacity=0, max_capacity=100)
+        chunk_worker_scale_out = appscaling.StepScalingAction(self, "ChunkWorkerScaleOut",
+                                                              scaling_target=chunk_worker_scaling,
+                                                              adjustment_type=appscaling.AdjustmentType.CHANGE_IN_CAPACITY,
+                                                              metric_aggregation_type=appscaling.MetricAggregationType.MAXIMUM,
+                                                              # New tasks need a couple of minutes before they drain the queue
+                                                              cooldown=Duration.minutes(3))
+        chunk_worker_scale_out.add_adjustment(adjustment=1, lower_bound=0, upper_bound=9)
+        chunk_worker_scale_out.add_adjustment(adjustment=10, lower_bound=9, upper_bound=49)
+        chunk_worker_scale_out.add_adjustment(adjustment=50, lower_bound=49)
+        cloudwatch.Alarm(self, "ChunksWaitingAlarm",
+                         metric=chunks_waiting,
+                         threshold=1,
+                         comparison_operator=cloudwatch.ComparisonOperator.GREATER_THAN_OR_EQUAL_TO_THRESHOLD,
+                         evaluation_periods=1,
+                         treat_missing_data=cloudwatch.TreatMissingData.NOT_BREACHING,
+                         ).add_alarm_action(cloudwatch_actions.ApplicationScalingAction(chunk_worker_scale_out))
+        chunk_worker_scale_in = appscaling.StepScalingAction(self, "ChunkWorkerScaleIn",
+                                                             scaling_target=chunk_worker_scaling,
+                                                             adjustment_type=appscaling.AdjustmentType.EXACT_CAPACITY,
+                                                             metric_aggregation_type=appscaling.MetricAggregationType.MAXIMUM)
+        chunk_worker_scale_in.add_adjustment(adjustment=0, upper_bound=0)
+        cloudwatch.Alarm(self, "NoChunksOutstandingAlarm",
+                         metric=chunks_outstanding,
+                         threshold=0,
+                         comparison_operator=cloudwatch.ComparisonOperator.LESS_THAN_OR_EQUAL_TO_THRESHOLD,
+                         # The queue metrics lag; wait for several empty minutes before stopping the workers
+                         evaluation_periods=5,
+                         treat_missing_data=cloudwatch.TreatMissingData.BREACHING,
+                         ).add_alarm_action(cloudwatch_actions.ApplicationScalingAction(chunk_worker_scale_in))
+
+        # Map iterator: enqueue the chunk and wait for the workers to report back with the task token
+        chunk_task = tasks.SqsSendMessage(self, "Queue Chunk",
+                                          queue=autotag_queue,
+                                          integration_pattern=sfn.IntegrationPattern.WAIT_FOR_TASK_TOKEN,
+                                          message_body=sfn.TaskInput.from_object({
+                                              "task_token": sfn.JsonPath.task_token,
+                                              "s3_bucket": sfn.JsonPath.string_at("$.s3_bucket"),
+                                              "s3_key": sfn.JsonPath.string_at("$.s3_key"),
+                                              "chunk_key": sfn.JsonPath.string_at("$.chunk_key"),
+                                          }),
+                                          )
+
+        # Step Function Distributed Map State, reading the chunk manifest written by the split lambda
+        map_state = sfn.DistributedMap(self, "Map",
+                            max_concurrency=1000,
+                            item_reader=sfn.S3JsonItemReader(
+                                bucket=bucket,
+                                key=sfn.JsonPath.string_at("$.chunks_manifest_key")
+                            ),
+                            result_writer=sfn.ResultWriter(bucket=bucket, prefix="map-results/"),
                             result_path="$.MapResults")
 
-        map_state.iterator(ecs_task_1.next(ecs_task_2))
+        map_state.item_processor(chunk_task)
 
         cloudwatch_logs_policy = iam.PolicyStatement(
                     actions=["cloudwatch:PutMetricData"],  # Allow PutMetricData action
                     resources=["*"],  # All CloudWatch resources # All CloudWatch Logs resources
         )
+        java_lambda_log_group = component_log_group("JavaLambdaLogGroup")
         java_lambda = lambda_.Function(
             self, 'JavaLambda',
             runtime=lambda_.Runtime.JAVA_21,
             handler='com.example.App::handleRequest',
-            code=lambda_.Code.from_asset('lambda/java_lambda/PDFMergerLambda/target/PDFMergerLambda-1.0-SNAPSHOT.jar'),
+            # Built from source with Maven at synth time, so the deployed jar always matches App.java. The build runs
+            # on a copy of the sources so it leaves no target/ directory behind in the working tree.
+            code=lambda_.Code.from_asset("lambda/java_lambda/PDFMergerLambda",
+                                         exclude=["target", "**/.DS_Store"],
+                                         bundling=cdk.BundlingOptions(
+                                             image=lambda_.Runtime.JAVA_21.bundling_image,
+                                             user="root",
+                                             command=["bash", "-c",
+                                                      "cp -r /asset-input /tmp/build && cd /tmp/build"
+                                                      " && mvn -B -q package"
+                                                      " && cp target/PDFMergerLambda-1.0-SNAPSHOT.jar /asset-output/"],
+                                             output_type=cdk.BundlingOutput.ARCHIVED,
+                                         )),
             environment={
-                'BUCKET_NAME': bucket.bucket_name  # this line sets the environment variable
+                'BUCKET_NAME': bucket.bucket_name,  # this line sets the environment variable
+                # C1-only JIT: the merger runs once per execution, so startup matters more than peak throughput
+                'JAVA_TOOL_OPTIONS': '-XX:+TieredCompilation -XX:TieredStopAtLevel=1'
             },
             timeout=Duration.seconds(900),
-            memory_size=1024
+            memory_size=2048,
+            # The uber-jar is architecture independent, so the merger runs on Graviton like the other Lambdas
+            architecture=lambda_.Architecture.ARM_64,
+            log_group=java_lambda_log_group
         )
+        # Lambda supports SnapStart on arm64, but the pinned aws-cdk-lib still rejects that combination in
+        # snap_start=, so it is set on the underlying CloudFormation resource instead
+        java_lambda.node.default_child.add_property_override("SnapStart", {"ApplyOn": "PublishedVersions"})
+        # SnapStart only applies to published versions, so the workflow invokes the merger through an alias
+        java_lambda_alias = lambda_.Alias(self, "JavaLambdaLive",
+                                          alias_name="live",
+                                          version=java_lambda.current_version)
 
         java_lambda.add_to_role_policy(cloudwatch_logs_policy)
         java_lambda_task = tasks.LambdaInvoke(self, "Invoke Java Lambda",
-                                      lambda_function=java_lambda,
+                                      lambda_function=java_lambda_alias,
                                       payload=sfn.TaskInput.from_object({
-        "fileNames.$": "$.chunks[*].s3_key"
+        "chunksManifestKey.$": "$.chunks_manifest_key"
                      }),
                                       output_path=sfn.JsonPath.string_at("$.Payload"))
-        bucket.grant_read_write(java_lambda)
+        bucket.grant_read_write(java_lambda, work_objects)
+
+        # The Python Lambdas always run on Graviton, so their dependencies are built for linux/arm64
+        # regardless of the machine running synth
+        lambda_arch = lambda_.Architecture.ARM_64
+        lambda_build_platform = "linux/arm64"
+
+        # Lambdas on the workflow's critical path are invoked through an alias that keeps warm instances,
+        # scaled on provisioned concurrency utilization
+        def add_provisioned_alias(function, alias_id, alias_name="live"):
+            alias = lambda_.Alias(self, alias_id,
+                                  alias_name=alias_name,
+                                  version=function.current_version,
+                                  provisioned_concurrent_executions=2)
+            alias.add_auto_scaling(min_capacity=2, max_capacity=10).scale_on_utilization(utilization_target=0.7)
+            return alias
+
+        # Shared image for the add title and accessibility checker Lambdas; each function picks its handler via cmd
+        a11y_shared_image_asset = ecr_assets.DockerImageAsset(self, "A11yLambdaImage",
+                                                              directory="lambda/a11y_shared",
+                                                              platform=ecr_assets.Platform.LINUX_ARM64,
+                                                              **docker_cache_options("a11y-shared"))
 
         # Define the Add Title Lambda function
-        host_machine = platform.machine().lower()
-        print("Architecture of Machine:",host_machine)
-        if "arm" in host_machine:
-            lambda_arch = lambda_.Architecture.ARM_64
-        else:
-            lambda_arch = lambda_.Architecture.X86_64
-
-        add_title_lambda = lambda_.Function(
+        # Add title and the checkers have no metric filters and are only read from Logs Insights,
+        # which the cheaper Infrequent Access class supports
+        add_title_log_group = component_log_group("AddTitleLogGroup", log_group_class=logs.LogGroupClass.INFREQUENT_ACCESS)
+        add_title_lambda = lambda_.DockerImageFunction(
             self, 'AddTitleLambda',
-            runtime=lambda_.Runtime.PYTHON_3_12,
-            handler='myapp.lambda_handler',
-            code=lambda_.Code.from_docker_build('lambda/add_title'),
+            code=lambda_.DockerImageCode.from_ecr(a11y_shared_image_asset.repository,
+                                                  tag_or_digest=a11y_shared_image_asset.image_tag,
+                                                  cmd=["add_title.lambda_handler"]),
             timeout=Duration.seconds(900),
             memory_size=1024,
-            # architecture=lambda_.Architecture.ARM_64
             architecture=lambda_arch,
+            environment={
+                'BEDROCK_PERFORMANCE_CONFIG': bedrock_performance_config
+            },
+            log_group=add_title_log_group,
         )
 
-        # Grant the Lambda function read/write permissions to the S3 bucket
-        bucket.grant_read_write(add_title_lambda)
+        # Reads the merged PDF and writes the titled result
+        bucket.grant_read(add_title_lambda, work_objects)
+        bucket.grant_write(add_title_lambda, result_objects)
 
         # Define the task to invoke the Add Title Lambda function
         add_title_lambda_task = tasks.LambdaInvoke(
             self, "Invoke Add Title Lambda",
-            lambda_function=add_title_lambda,
+            lambda_function=add_provisioned_alias(add_title_lambda, "AddTitleLambdaLive"),
             payload=sfn.TaskInput.from_object({
                 "Payload.$": "$"
             })
@@ -263,99 +502,161 @@ class PDFAccessibility(Stack):
         # Chain the tasks in the state machine
         # chain = map_state.next(java_lambda_task).next(add_title_lambda_task)
         
-        a11y_precheck = lambda_.Function(
+        a11y_precheck_log_group = component_log_group("A11yPrecheckLogGroup",
+                                                      log_group_class=logs.LogGroupClass.INFREQUENT_ACCESS)
+        a11y_precheck = lambda_.DockerImageFunction(
             self,'accessibility_checker_before_remidiation',
-            runtime=lambda_.Runtime.PYTHON_3_10,
-            handler='main.lambda_handler',
-            code=lambda_.Code.from_docker_build('lambda/accessibility_checker_before_remidiation'),
-            timeout=Duration.seconds(900),
+            code=lambda_.DockerImageCode.from_ecr(a11y_shared_image_asset.repository,
+                                                  tag_or_digest=a11y_shared_image_asset.image_tag,
+                                                  cmd=["precheck.lambda_handler"]),
+            timeout=Duration.seconds(120),
             memory_size=512,
             architecture=lambda_arch,
+            reserved_concurrent_executions=50,
+            log_group=a11y_precheck_log_group,
         )
         
-        a11y_precheck.add_to_role_policy(
-            iam.PolicyStatement(
-            actions=["secretsmanager:GetSecretValue"],
-            resources=[f"arn:aws:secretsmanager:{region}:{account_id}:secret:/myapp/*"]
-        ))
-        bucket.grant_read_write(a11y_precheck)
-        a11y_precheck.add_to_role_policy(cloudwatch_logs_policy)
+        # Both checkers need the same permissions; one managed policy keeps them out of each role's inline policy
+        a11y_checker_policy = iam.ManagedPolicy(self, "A11yCheckerPolicy",
+                                                statements=[client_credentials_policy, cloudwatch_logs_policy])
+        a11y_checker_policy.attach_to_role(a11y_precheck.role)
+        # Reads the upload, writes its report, and copies already compliant uploads straight to the results
+        bucket.grant_read(a11y_precheck, upload_objects)
+        bucket.grant_write(a11y_precheck, work_objects)
+        bucket.grant_write(a11y_precheck, result_objects)
 
         a11y_precheck_lambda_task = tasks.LambdaInvoke(
             self, 
             "a11y_precheck",
-            lambda_function=a11y_precheck,
+            lambda_function=add_provisioned_alias(a11y_precheck, "A11yPrecheckLive"),
             payload=sfn.TaskInput.from_json_path_at("$"),
-            output_path="$.Payload"
+            result_selector={"needs_remediation.$": "$.Payload.needs_remediation"},
+            result_path="$.Precheck"
         )
 
-        a11y_postcheck = lambda_.Function(
+        a11y_postcheck_log_group = component_log_group("A11yPostcheckLogGroup",
+                                                       log_group_class=logs.LogGroupClass.INFREQUENT_ACCESS)
+        a11y_postcheck = lambda_.DockerImageFunction(
             self,'accessibility_checker_after_remidiation',
-            runtime=lambda_.Runtime.PYTHON_3_10,
-            handler='main.lambda_handler',
-            code=lambda_.Code.from_docker_build('lambda/accessability_checker_after_remidiation'),
+            code=lambda_.DockerImageCode.from_ecr(a11y_shared_image_asset.repository,
+                                                  tag_or_digest=a11y_shared_image_asset.image_tag,
+                                                  cmd=["postcheck.lambda_handler"]),
+            # Checks the full merged document, and a failure here fails an otherwise finished remediation
             timeout=Duration.seconds(900),
             memory_size=512,
             architecture=lambda_arch,
+            log_group=a11y_postcheck_log_group,
         )
         
-        a11y_postcheck.add_to_role_policy(
-            iam.PolicyStatement(
-            actions=["secretsmanager:GetSecretValue"],
-            resources=[f"arn:aws:secretsmanager:{region}:{account_id}:secret:/myapp/*"]
-        ))
-        bucket.grant_read_write(a11y_postcheck)
-        a11y_postcheck.add_to_role_policy(cloudwatch_logs_policy)
+        a11y_checker_policy.attach_to_role(a11y_postcheck.role)
+        bucket.grant_read(a11y_postcheck, result_objects)
+        bucket.grant_write(a11y_postcheck, work_objects)
 
         a11y_postcheck_lambda_task = tasks.LambdaInvoke(
             self, 
             "a11y_postcheck",
-            lambda_function=a11y_postcheck,
+            lambda_function=add_provisioned_alias(a11y_postcheck, "A11yPostcheckLive"),
             payload=sfn.TaskInput.from_json_path_at("$"),
             output_path="$.Payload"
         )
         
         chain = map_state.next(java_lambda_task).next(add_title_lambda_task).next(a11y_postcheck_lambda_task)
 
-        parallel_state = sfn.Parallel(self, "ParallelState",
-                                      result_path="$.ParallelResults")
-        parallel_state.branch(chain)
-        parallel_state.branch(a11y_precheck_lambda_task)
+        # The pre-check runs first; PDFs that already pass skip the remediation chain.
+        # If the pre-check itself fails, the PDF is remediated anyway.
+        a11y_precheck_lambda_task.add_catch(map_state, result_path="$.PrecheckError")
+        precheck = a11y_precheck_lambda_task.next(
+            sfn.Choice(self, "NeedsRemediation")
+            .when(sfn.Condition.boolean_equals("$.Precheck.needs_remediation", False), sfn.Pass(self, "AlreadyCompliant"))
+            .otherwise(chain)
+        )
+        # An untagged PDF can never pass the checker, so it goes straight to remediation without the Adobe call
+        skip_precheck = sfn.Pass(self, "SkipPrecheck",
+                                 result=sfn.Result.from_object({"needs_remediation": True}),
+                                 result_path="$.Precheck").next(chain)
+        workflow = (
+            sfn.Choice(self, "IsTagged")
+            .when(sfn.Condition.and_(sfn.Condition.is_present("$.is_tagged"),
+                                     sfn.Condition.boolean_equals("$.is_tagged", False)), skip_precheck)
+            .otherwise(precheck)
+        )
 
         log_group_stepfunctions = logs.LogGroup(self, "StepFunctionLogs",
             log_group_name="/aws/states/MyStateMachine_PDFAccessibility",
-            retention=logs.RetentionDays.ONE_WEEK,
+            retention=logs.RetentionDays.THREE_DAYS,
             removal_policy=cdk.RemovalPolicy.DESTROY
         )
         # State Machine
+        # Only errors are logged by default; deploy with `-c sfn_verbose=true` to log every state transition with its data
+        sfn_verbose = str(self.node.try_get_context("sfn_verbose")).lower() == "true"
 
         state_machine = sfn.StateMachine(self, "MyStateMachine",
-                                         definition=parallel_state,
-                                         timeout=Duration.minutes(10),
+                                         definition=workflow,
+                                         # Leaves room for a chunk that waits out a full Bedrock batch job (when
+                                         # bedrock_batch is enabled) on top of autotagging, merging and both checks
+                                         timeout=Duration.hours(1),
                                          logs=sfn.LogOptions(
                                              destination=log_group_stepfunctions,
-                                             level=sfn.LogLevel.ALL
+                                             level=sfn.LogLevel.ALL if sfn_verbose else sfn.LogLevel.ERROR,
+                                             include_execution_data=sfn_verbose
                                          ))
+        # The chunk workers report each chunk's result back with its task token
+        state_machine.grant_task_response(ecs_task_role)
+
+        # A dead-lettered chunk has no worker left to answer its task token. Visibility timeout x receive count
+        # is longer than the execution timeout, so a Queue Chunk task timeout would never fire before it;
+        # instead this Lambda fails the token as soon as the chunk reaches either DLQ, which fails the Map
+        # the same way a chunk failure reported by a worker does.
+        chunk_dlq_log_group = component_log_group("ChunkDLQLogGroup")
+        chunk_dlq_lambda = lambda_.Function(
+            self, 'ChunkDLQ',
+            runtime=lambda_.Runtime.PYTHON_3_10,
+            handler='main.lambda_handler',
+            code=lambda_.Code.from_asset("lambda/chunk_dlq", exclude=["__pycache__", "*.pyc"]),
+            timeout=Duration.seconds(60),
+            memory_size=128,
+            architecture=lambda_.Architecture.ARM_64,
+            log_group=chunk_dlq_log_group
+        )
+        state_machine.grant_task_response(chunk_dlq_lambda)
+        for chunk_dlq in (autotag_dlq, alt_text_dlq):
+            chunk_dlq_lambda.add_event_source(lambda_event_sources.SqsEventSource(chunk_dlq, batch_size=10))
         
         # Lambda Function
+        split_pdf_log_group = component_log_group("SplitPDFLogGroup")
         split_pdf_lambda = lambda_.Function(
             self, 'SplitPDF',
             runtime=lambda_.Runtime.PYTHON_3_10,
             handler='main.lambda_handler',
-            code=lambda_.Code.from_docker_build("lambda/split_pdf"),
+            # Bundled with a source hash, so synth skips the pip install entirely while lambda/split_pdf is unchanged
+            code=lambda_.Code.from_asset("lambda/split_pdf",
+                                         exclude=["__pycache__", "*.pyc"],
+                                         bundling=cdk.BundlingOptions(
+                                             image=lambda_.Runtime.PYTHON_3_10.bundling_image,
+                                             platform=lambda_build_platform,
+                                             command=["bash", "-c",
+                                                      "pip install --no-compile -r requirements.txt -t /asset-output"
+                                                      " && cp main.py /asset-output"],
+                                         )),
             timeout=Duration.seconds(900),
-            memory_size=1024
+            memory_size=1024,
+            architecture=lambda_arch,
+            log_group=split_pdf_log_group
         )
 
         split_pdf_lambda.add_to_role_policy(cloudwatch_logs_policy)
 
         # S3 Permissions for Lambda
-        bucket.grant_read_write(split_pdf_lambda)
+        bucket.grant_read(split_pdf_lambda, upload_objects)
+        bucket.grant_write(split_pdf_lambda, work_objects)
+
+        # Uploads are handled by a provisioned alias, so the split (and the pypdf import) never waits on a cold start
+        split_pdf_alias = add_provisioned_alias(split_pdf_lambda, "SplitPdfProd", alias_name="prod")
 
         # Trigger Lambda on S3 Event
         bucket.add_event_notification(
             s3.EventType.OBJECT_CREATED,
-            s3n.LambdaDestination(split_pdf_lambda),
+            s3n.LambdaDestination(split_pdf_alias),
             s3.NotificationKeyFilter(prefix="pdf/"),
             s3.NotificationKeyFilter(suffix=".pdf")
         )
@@ -366,14 +667,29 @@ class PDFAccessibility(Stack):
         # Pass State Machine ARN to Lambda as an Environment Variable
         split_pdf_lambda.add_environment("STATE_MACHINE_ARN", state_machine.state_machine_arn)
         # Store log group names dynamically
-        split_pdf_lambda_log_group_name = f"/aws/lambda/{split_pdf_lambda.function_name}"
-        java_lambda_log_group_name = f"/aws/lambda/{java_lambda.function_name}"
-        add_title_lambda_log_group_name = f"/aws/lambda/{add_title_lambda.function_name}"
-        accessibility_checker_pre_log_group_name = f"/aws/lambda/{a11y_precheck.function_name}"
-        accessibility_checker_post_log_group_name = f"aws/lambda/{a11y_postcheck.function_name}"
-
+        split_pdf_lambda_log_group_name = split_pdf_log_group.log_group_name
+        java_lambda_log_group_name = java_lambda_log_group.log_group_name
+
+
+        # File status lines are logged as JSON ({"file": ..., "status": ...}); count them per status as a metric
+        # so the status overview is a metric read instead of a log scan
+        for status_log_id, status_log_group in [
+            ("SplitPdf", split_pdf_log_group),
+            ("PdfMerger", java_lambda_log_group),
+            ("ChunkDLQ", chunk_dlq_log_group),
+            ("Autotag", python_container_log_group),
+            ("AltText", javascript_container_log_group),
+        ]:
+            logs.MetricFilter(self, f"{status_log_id}FileStatusMetricFilter",
+                              log_group=status_log_group,
+                              filter_pattern=logs.FilterPattern.exists("$.status"),
+                              metric_namespace="PDFAccessibility",
+                              metric_name="FileStatus",
+                              metric_value="1",
+                              dimensions={"status": "$.status"})
 
         dashboard = cloudwatch.Dashboard(self, "PDF_Processing_Dashboard", dashboard_name="PDF_Processing_Dashboard",
+                                         default_interval=Duration.hours(1),
                                          variables=[cloudwatch.DashboardVariable(
                                             id="filename",
                                             type=cloudwatch.VariableType.PATTERN,
@@ -384,59 +700,71 @@ class PDFAccessibility(Stack):
                                             default_value=cloudwatch.DefaultValue.value(".*"),
                                         )]
                                          )
+        # Each query is saved as a Logs Insights query definition and shown as a dashboard widget.
+        # The "filename" dashboard variable rewrites the /filename/ pattern in the widgets.
+        file_filter = "@message like /filename/"
+        dashboard_queries = [
+            ("FileStatus", "File status",
+             [split_pdf_lambda_log_group_name, java_lambda_log_group_name, python_container_log_group.log_group_name, javascript_container_log_group.log_group_name,
+              chunk_dlq_log_group.log_group_name],
+             logs.QueryString(fields=["@timestamp", "file", "status"],
+                              filter_statements=["ispresent(status)", "file like /filename/"],
+                              stats="latest(status) as latestStatus by file",
+                              sort="file asc")),
+            ("SplitPdfLogs", "Split PDF Lambda Logs",
+             [split_pdf_lambda_log_group_name],
+             logs.QueryString(fields=["@message"], filter_statements=[file_filter])),
+            # Without verbose logging the log group only holds error events, which carry no execution data
+            # to match a file name against, so that panel lists errors for all files instead
+            ("StepFunctionLogs", "Step Function Execution Logs",
+             [log_group_stepfunctions.log_group_name],
+             logs.QueryString(fields=["@message"], filter_statements=[file_filter]))
+            if sfn_verbose else
+            ("StepFunctionLogs", "Step Function Errors (all files; deploy with sfn_verbose=true for full logs)",
+             [log_group_stepfunctions.log_group_name],
+             logs.QueryString(fields=["@timestamp", "@message"], sort="@timestamp desc")),
+            ("AutotagLogs", "ECS TASK 1 ADOBE AUTOTAG AND EXTRACT LOGS",
+             [python_container_log_group.log_group_name],
+             logs.QueryString(fields=["@message"], filter_statements=[file_filter])),
+            ("AltTextLogs", "ECS TASK 2 LLM alt text generation",
+             [javascript_container_log_group.log_group_name],
+             logs.QueryString(fields=["@message"], filter_statements=[file_filter])),
+            ("PdfMergerLogs", "Java Lambda Logs for PDF Merger",
+             [java_lambda_log_group_name],
+             logs.QueryString(fields=["@message"], filter_statements=[file_filter])),
+        ]
+
         # Add Widgets to the Dashboard
-        dashboard.add_widgets(
-            cloudwatch.LogQueryWidget(
-                title="File status",
-                log_group_names=[split_pdf_lambda_log_group_name, java_lambda_log_group_name, python_container_log_group.log_group_name,  javascript_container_log_group.log_group_name],
-                query_string='''fields @timestamp, @message
-                    | parse @message "File: *, Status: *" as file, status
-                    | stats latest(status) as latestStatus by file
-                    | sort file asc ''',
+        for query_id, title, log_group_names, query_string in dashboard_queries:
+            logs.QueryDefinition(self, f"{query_id}QueryDefinition",
+                                 query_definition_name=f"PDF_Processing/{title}",
+                                 query_string=query_string,
+                                 log_groups=[logs.LogGroup.from_log_group_name(self, f"{query_id}QueryLogGroup{i}", name)
+                                             for i, name in enumerate(log_group_names)])
+            dashboard.add_widgets(cloudwatch.LogQueryWidget(
+                title=title,
+                log_group_names=log_group_names,
+                query_string=query_string.to_string(),
                 width=24,
                 height=6
-            ),
-            cloudwatch.LogQueryWidget(
-                title="Split PDF Lambda Logs",
-                log_group_names=[split_pdf_lambda_log_group_name],
-                query_string='''fields @message 
-                                | filter @message like /filename/''',
-                width=24,
-                height=6
-            ),
-            cloudwatch.LogQueryWidget(
-                title="Step Function Execution Logs",
-                log_group_names=[log_group_stepfunctions.log_group_name],
-                query_string='''fields @message 
-                                | filter @message like /filename/''',
-                width=24,
-                height=6
-            ),
-            cloudwatch.LogQueryWidget(
-                title="ECS TASK 1 ADOBE AUTOTAG AND EXTRACT LOGS",
-                log_group_names=[python_container_log_group.log_group_name],
-                query_string='''fields @message 
-                                | filter @message like /filename/''',
-                width=24,
-                height=6
-            ),
-            cloudwatch.LogQueryWidget(
-                title="ECS TASK 2 LLM alt text generation",
-                log_group_names=[javascript_container_log_group.log_group_name],
-                query_string='''fields @message 
-                                | filter @message like /filename/''',
-                width=24,
-                height=6
-            ),
-            cloudwatch.LogQueryWidget(
-                title="Java Lambda Logs for PDF Merger",
-                log_group_names=[java_lambda_log_group_name],
-                query_string='''fields @message 
-                                | filter @message like /filename/''',
-                width=24,
-                height=6
-            ),
-        )
+            ))
+        dashboard.add_widgets(cloudwatch.GraphWidget(
+            title="File status counts",
+            left=[cloudwatch.MathExpression(
+                expression="SEARCH('{PDFAccessibility,status} MetricName=\"FileStatus\"', 'Sum', 300)",
+                label="",
+                period=Duration.minutes(5),
+            )],
+            width=24,
+            height=6
+        ))
+        # Shows whether the split Lambda's provisioned concurrency is sized right
+        dashboard.add_widgets(cloudwatch.GraphWidget(
+            title="Split PDF Provisioned Concurrency Utilization",
+            left=[split_pdf_alias.metric("ProvisionedConcurrencyUtilization", statistic="Maximum")],
+            width=24,
+            height=6
+        ))
 
 app = cdk.App()
 PDFAccessibility(app, "PDFAccessibility")
@@ -50,6 +50,12 @@ Environment Variables Required:
 - `S3_BUCKET_NAME`: The name of the S3 bucket to download and upload the PDF file.
 - `S3_FILE_KEY`: The key (path) of the PDF file in the S3 bucket.
 
+Optional:
+- `CHUNK_QUEUE_URL` / `NEXT_QUEUE_URL`: Run as a long-lived worker that takes chunks from the first queue and forwards
+  them to the second (alt text) queue once processed, instead of processing the single chunk named above.
+- `SHARED_DIR`: A volume shared with the alt text container. In worker mode every uploaded object is also copied
+  there under `<chunk message id>/<S3 key>`, so the alt text container can read it without downloading it again.
+
 This script is ideal for batch processing of PDFs that need to be made accessible, tagged, and analyzed for further use
 in structured formats. It handles compliance with accessibility standards and ensures easy re-upload of enhanced PDFs 
 and related content.
@@ -60,11 +66,17 @@ import os
 import boto3
 import logging
 import json
+import re
 import sys
+import shutil
+import signal
+import tempfile
+import time
 from botocore.exceptions import ClientError
 
+# Structure paths of heading elements in Adobe's structuredData.json, e.g. //Document/H1
+HEADING_PATH = re.compile(r'H[1-6]')
 
-logging.basicConfig(level=logging.INFO)
 
 def download_file_from_s3(bucket_name,file_base_name, file_key, local_path):
     """
@@ -81,7 +93,50 @@ def download_file_from_s3(bucket_name,file_base_name, file_key, local_path):
     s3.download_file(bucket_name, f"temp/{file_base_name}/{file_key}", local_path)
     logging.info(f"Downloaded {file_key} from {bucket_name} to {local_path}")
 
-def save_to_s3(filename, bucket_name, folder_name,file_basename, file_key):
+def copy_to_shared_dir(filename, key, shared_prefix):
+    """
+    Copies a file into the directory shared with the alt text container, under the same key it has in S3.
+    Copies are namespaced by the chunk message they belong to, so a later upload of a file with the same name
+    never picks up a copy left from an earlier run. Does nothing when SHARED_DIR or the prefix is not set.
+    
+    Args:
+        filename (str): The path of the file to copy.
+        key (str): The S3 key the file was uploaded to.
+        shared_prefix (str): The directory for this chunk's copies, the id of the chunk message.
+    """
+    shared_dir = os.getenv('SHARED_DIR')
+    if not shared_dir or not shared_prefix:
+        return
+    shared_path = os.path.join(shared_dir, shared_prefix, key)
+    os.makedirs(os.path.dirname(shared_path), exist_ok=True)
+    shutil.copyfile(filename, shared_path)
+
+def sweep_shared_dir(max_age_seconds):
+    """
+    Removes shared copies older than max_age_seconds, along with directories left empty.
+    The alt text container deletes a copy when it reads it, but a chunk picked up by another task's
+    alt text worker is read from S3 instead, and its copies here would otherwise stay for the life of the task.
+    
+    Args:
+        max_age_seconds (int): How long a copy is kept for the alt text container of this task.
+    """
+    shared_dir = os.getenv('SHARED_DIR')
+    if not shared_dir:
+        return
+    cutoff = time.time() - max_age_seconds
+    for root, dirs, files in os.walk(shared_dir, topdown=False):
+        for name in files:
+            path = os.path.join(root, name)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+            except FileNotFoundError:
+                # Already read and removed by the alt text container
+                pass
+        if root != shared_dir and not os.listdir(root):
+            os.rmdir(root)
+
+def save_to_s3(filename, bucket_name, folder_name,file_basename, file_key, shared_prefix=None):
     """
     Uploads a file to an S3 bucket.
     
@@ -91,12 +146,15 @@ def save_to_s3(filename, bucket_name, folder_name,file_basename, file_key):
         folder_name (str): The folder where the file will be uploaded.
         file_basename (str): The base name of the file.
         file_key (str): The key (path) where the file will be uploaded.
+        shared_prefix (str, optional): The shared directory namespace for this chunk's copies.
     """
 
     s3 = boto3.client('s3')
 
+    key = f"temp/{file_basename}/{folder_name}/COMPLIANT_{file_key}"
     with open(filename, "rb") as data:
-        s3.upload_fileobj(data, bucket_name, f"temp/{file_basename}/{folder_name}/COMPLIANT_{file_key}")
+        s3.upload_fileobj(data, bucket_name, key)
+    copy_to_shared_dir(filename, key, shared_prefix)
 
 
 def get_secret(basefilename):
@@ -133,7 +191,7 @@ def get_secret(basefilename):
     return client_id, client_secret
 
 
-def pdf_processing(pdf_path, file_base_name, file_key, bucket_name):
+def pdf_processing(pdf_path, file_base_name, file_key, bucket_name, shared_prefix=None):
     """
     Processes the downloaded PDF file, adds TOC, custom metadata, and extracts text, tables, and images.
     
@@ -142,13 +200,13 @@ def pdf_processing(pdf_path, file_base_name, file_key, bucket_name):
         file_base_name (str): The base name of the file.
         file_key (str): The key of the file in the S3 bucket.
         bucket_name (str): The S3 bucket name.
+        shared_prefix (str, optional): The shared directory namespace for this chunk's copies.
     """
     import pymupdf
     import logging
     import os
     from datetime import datetime
     import json
-    import re
     import zipfile
     from pypdf import PdfReader, PdfWriter
     import boto3
@@ -175,7 +233,6 @@ def pdf_processing(pdf_path, file_base_name, file_key, bucket_name):
 
     reader = PdfReader(pdf_path)
     writer = PdfWriter()
-    logging.basicConfig(level=logging.INFO)
 
     # Add all pages to the writer
     for page in reader.pages:
@@ -188,9 +245,6 @@ def pdf_processing(pdf_path, file_base_name, file_key, bucket_name):
     with open(filename, "wb") as f:
         writer.write(f)
 
-    # Initialize the logger
-    logging.basicConfig(level=logging.INFO)
-
     class AutotagPDFWithOptions:
         def __init__(self):
             try:
@@ -346,7 +400,7 @@ def pdf_processing(pdf_path, file_base_name, file_key, bucket_name):
         data = json.load(file)
 
     # Extract bookmarks based on headings found in the structured data
-    bookmarks = [(element["Text"], element["Page"] + 1) for element in data["elements"] if re.search(r'H[1-6]', element["Path"])]
+    bookmarks = [(element["Text"], element["Page"] + 1) for element in data["elements"] if HEADING_PATH.search(element["Path"])]
 
     def add_toc_to_pdf(pdf_document, toc_entries):
         # Create a list of toc entries in the format required by PyMuPDF
@@ -412,7 +466,7 @@ def pdf_processing(pdf_path, file_base_name, file_key, bucket_name):
 
 
 
-    save_to_s3(filename, bucket_name, "output_autotag",file_base_name, file_key)
+    save_to_s3(filename, bucket_name, "output_autotag",file_base_name, file_key, shared_prefix)
     logging.info(f"PDF saved with updated metadata and TOC. File location: COMPLIANT_{file_key}")
     import os
     import pandas as pd
@@ -420,8 +474,6 @@ def pdf_processing(pdf_path, file_base_name, file_key, bucket_name):
     from openpyxl.drawing.image import Image
     import logging
 
-    logging.basicConfig(level=logging.INFO)
-
     def extract_images_from_excel(file_path, output_dir, s3_bucket, s3_folder):
         """
         Extract images from an Excel file and save them to a directory and upload them to S3.
@@ -472,7 +524,9 @@ def pdf_processing(pdf_path, file_base_name, file_key, bucket_name):
         logging.info(f'Filename : {filename} | Image Paths: {image_paths}')
         # Upload the images to S3
         for img_path in image_paths:
-            s3.upload_file(img_path, s3_bucket, f'{s3_folder}/images/{file_key}_{os.path.basename(img_path)}')
+            image_key = f'{s3_folder}/images/{file_key}_{os.path.basename(img_path)}'
+            s3.upload_file(img_path, s3_bucket, image_key)
+            copy_to_shared_dir(img_path, image_key, shared_prefix)
             logging.info(f'Filename : {filename} | Uploaded image to S3')
         # Write the object IDs and image paths to a text file
         logging.info(f'Filename : {filename} | Object IDs: {object_ids} : Image Paths: {image_paths}')
@@ -482,39 +536,156 @@ def pdf_processing(pdf_path, file_base_name, file_key, bucket_name):
                 f.write(f"{objid} {os.path.basename(img_path)}\n")
 
         # Upload the text file to S3
-        s3.upload_file(os.path.join(output_dir, "temp_images_data.txt"), s3_bucket, f'{s3_folder}/{file_key}_temp_images_data.txt')
+        images_data_key = f'{s3_folder}/{file_key}_temp_images_data.txt'
+        s3.upload_file(os.path.join(output_dir, "temp_images_data.txt"), s3_bucket, images_data_key)
+        copy_to_shared_dir(os.path.join(output_dir, "temp_images_data.txt"), images_data_key, shared_prefix)
     extract_images_from_excel(f"output/AutotagPDF/{filename}.xlsx", "output/zipfile/images", bucket_name, f"temp/{file_base_name}/output_autotag")
+def process_chunk(bucket_name, s3_file_key, shared_prefix=None):
+    """
+    Downloads a chunk from S3, runs the autotag and extraction pipeline on it and uploads the results.
+    
+    Args:
+        bucket_name (str): The S3 bucket name.
+        s3_file_key (str): The key of the chunk, in the form pdf/<file base name>/<chunk file name>.
+        shared_prefix (str, optional): The shared directory namespace for this chunk's copies.
+    """
+    file_key = s3_file_key.split('/')[2]
+    file_base_name = s3_file_key.split('/')[1]
+    logging.info(f'Filename : {file_key} | Bucket Name: {bucket_name}')
+
+    # Define the local file path where the file will be saved
+    local_file_path = os.path.basename(file_key)  # Save the file with its original name
+    
+    # Download the file from S3
+    download_file_from_s3(bucket_name,file_base_name, file_key, local_file_path)
+    pdf_processing(local_file_path, file_base_name,file_key, bucket_name, shared_prefix)
+    logging.info(f'Filename : {file_key} | Processing completed for pdf file')
+
+def parse_chunk_message(message):
+    """
+    Parses and validates the body of a chunk message.
+    
+    Args:
+        message (dict): The received SQS message.
+    
+    Returns:
+        dict: The message body, with at least task_token, s3_bucket and s3_key.
+    
+    Raises:
+        ValueError: If the body is not a chunk message.
+    """
+    body = json.loads(message['Body'])
+    if not isinstance(body, dict) or not all(isinstance(body.get(field), str) for field in ('task_token', 's3_bucket', 's3_key')):
+        raise ValueError("chunk message needs task_token, s3_bucket and s3_key")
+    if body['s3_key'].count('/') < 2:
+        raise ValueError(f"unexpected chunk key {body['s3_key']}")
+    return body
+
+def run_worker(queue_url, next_queue_url):
+    """
+    Long-running worker loop. Each message is a chunk queued by the Step Function together with its task token.
+    A processed chunk is forwarded to the alt text queue; a failed chunk fails the Step Function task.
+    
+    Args:
+        queue_url (str): The queue this worker consumes chunks from.
+        next_queue_url (str): The alt text queue processed chunks are forwarded to.
+    """
+    sqs = boto3.client('sqs')
+    stepfunctions = boto3.client('stepfunctions')
+    app_dir = os.getcwd()
+    in_flight = {}
+    # A shared copy older than the queue's visibility timeout is no longer waited for
+    shared_copy_max_age = int(os.getenv('CHUNK_VISIBILITY_TIMEOUT_SECONDS', '1800'))
+
+    def release_in_flight(signum, frame):
+        # Fargate Spot sends SIGTERM before reclaiming the task; hand the chunk back to the queue right away
+        # instead of leaving it invisible until the visibility timeout runs out
+        if 'receipt_handle' in in_flight:
+            sqs.change_message_visibility(QueueUrl=queue_url, ReceiptHandle=in_flight['receipt_handle'], VisibilityTimeout=0)
+        sys.exit(0)
+
+    signal.signal(signal.SIGTERM, release_in_flight)
+
+    while True:
+        sweep_shared_dir(shared_copy_max_age)
+        try:
+            response = sqs.receive_message(QueueUrl=queue_url, MaxNumberOfMessages=1, WaitTimeSeconds=20)
+        except Exception as e:
+            # Transient AWS errors must not end the worker; try again after a short pause
+            logging.info(f"Could not receive chunks: {e}")
+            time.sleep(5)
+            continue
+        for message in response.get('Messages', []):
+            try:
+                body = parse_chunk_message(message)
+            except ValueError as e:
+                # Hand the message straight back so it reaches the DLQ after its last receive, instead of
+                # ending the worker or waiting out the visibility timeout on every receive
+                logging.info(f"Skipping malformed chunk message {message['MessageId']}: {e}")
+                try:
+                    sqs.change_message_visibility(QueueUrl=queue_url, ReceiptHandle=message['ReceiptHandle'], VisibilityTimeout=0)
+                except Exception as release_error:
+                    logging.info(f"Could not release chunk message {message['MessageId']}: {release_error}")
+                continue
+            file_base_name = body['s3_key'].split('/')[1]
+            try:
+                # Every chunk gets a fresh working directory so local outputs do not pile up between chunks
+                with tempfile.TemporaryDirectory() as work_dir:
+                    os.chdir(work_dir)
+                    in_flight['receipt_handle'] = message['ReceiptHandle']
+                    try:
+                        process_chunk(body['s3_bucket'], body['s3_key'], message['MessageId'])
+                    finally:
+                        in_flight.clear()
+                        os.chdir(app_dir)
+                # The alt text worker only trusts shared copies under this chunk's own prefix
+                sqs.send_message(QueueUrl=next_queue_url,
+                                 MessageBody=json.dumps({**body, "shared_prefix": message['MessageId']}))
+            except Exception as e:
+                logging.info(json.dumps({"file": file_base_name, "status": "Failed in First ECS task"}))
+                logging.info(f"Filename : {body['s3_key']} | Error: {e}")
+                try:
+                    stepfunctions.send_task_failure(taskToken=body['task_token'], error="AutotagFailed", cause=str(e)[:32768])
+                except Exception as callback_error:
+                    # The task token is no longer valid once the execution has timed out or been stopped
+                    logging.info(f"Filename : {body['s3_key']} | Could not report the failure: {callback_error}")
+            try:
+                sqs.delete_message(QueueUrl=queue_url, ReceiptHandle=message['ReceiptHandle'])
+            except Exception as e:
+                logging.info(f"Filename : {body['s3_key']} | Could not delete the chunk message: {e}")
+
 def main():
     """
     Main function that coordinates the downloading, processing, and uploading of PDF files and associated content.
+    Runs as a queue worker when CHUNK_QUEUE_URL is set, otherwise processes the single chunk named in the environment.
     """
 
-    # Configure logging to display only the message
-    logging.basicConfig(format='%(message)s', level=logging.INFO)
+    # Configure logging to display only the message, so the status lines reach CloudWatch as plain JSON
+    # that the metric filters and dashboard queries can parse. force replaces any handler set up on import.
+    logging.basicConfig(format='%(message)s', level=logging.INFO, force=True)
 
     # Create a logger
     logger = logging.getLogger(__name__)
 
+    queue_url = os.getenv('CHUNK_QUEUE_URL')
+    if queue_url:
+        run_worker(queue_url, os.getenv('NEXT_QUEUE_URL'))
+        return
+
+    file_key = file_base_name = None
     try:    
         bucket_name = os.getenv('S3_BUCKET_NAME')
-        file_key = os.getenv('S3_FILE_KEY').split('/')[2]
-        file_base_name = os.getenv('S3_FILE_KEY').split('/')[1]
-        logging.info(f'Filename : {file_key} | Bucket Name: {bucket_name}')
-        if not bucket_name or not file_key:
+        s3_file_key = os.getenv('S3_FILE_KEY')
+        if not bucket_name or not s3_file_key:
             logging.info("Error: S3_BUCKET_NAME and S3_FILE_KEY environment variables are required.")
             return
-
-        # Define the local file path where the file will be saved
-        local_file_path = os.path.basename(file_key)  # Save the file with its original name
-        
-        # Download the file from S3
-        download_file_from_s3(bucket_name,file_base_name, file_key, local_file_path)
-        pdf_processing(local_file_path, file_base_name,file_key, bucket_name)
-        logging.info(f'Filename : {file_key} | Processing completed for pdf file')
+        file_key = s3_file_key.split('/')[2]
+        file_base_name = s3_file_key.split('/')[1]
+        process_chunk(bucket_name, s3_file_key)
     except Exception as e:
-        logger.info(f"File: {file_base_name}, Status: Failed in First ECS task")
+        logger.info(json.dumps({"file": file_base_name, "status": "Failed in First ECS task"}))
         logger.info(f"Filename : {file_key} | Error: {e}")
         sys.exit(1)
         
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -30,6 +30,9 @@
 
 const { S3Client, GetObjectCommand, PutObjectCommand } = require('@aws-sdk/client-s3');
 const { BedrockRuntimeClient, InvokeModelCommand } = require('@aws-sdk/client-bedrock-runtime');
+const { BedrockClient, CreateModelInvocationJobCommand, GetModelInvocationJobCommand, StopModelInvocationJobCommand } = require('@aws-sdk/client-bedrock');
+const { SQSClient, ReceiveMessageCommand, DeleteMessageCommand, ChangeMessageVisibilityCommand } = require('@aws-sdk/client-sqs');
+const { SFNClient, SendTaskSuccessCommand, SendTaskFailureCommand } = require('@aws-sdk/client-sfn');
 const fs = require('fs').promises;
 const fs_1 = require('fs');
 const winston = require('winston');
@@ -53,36 +56,104 @@ const logger = winston.createLogger({
 // Create an S3 client instance.
 const s3Client = new S3Client({ region: "us-east-1" });
 
+// Bedrock latency setting ("optimized" or "standard") passed in from the Step Function.
+const bedrockPerformanceConfig = process.env.BEDROCK_PERFORMANCE_CONFIG;
+const performanceConfigParams = bedrockPerformanceConfig
+    ? { performanceConfigLatency: bedrockPerformanceConfig }
+    : {};
+
+// Bedrock batch inference settings for image-heavy chunks, used only when a batch role is passed in (the stack's
+// bedrock_batch option). Batch jobs need at least 100 records.
+const batchRoleArn = process.env.BEDROCK_BATCH_ROLE_ARN;
+const batchThreshold = parseInt(process.env.BEDROCK_BATCH_THRESHOLD || "100", 10);
+// Must stay below the queue visibility timeout and the state machine timeout, or the chunk is redelivered
+// or the execution times out while the job is still being polled.
+const batchMaxWaitSeconds = parseInt(process.env.BEDROCK_BATCH_MAX_WAIT_SECONDS || "1200", 10);
+// Visibility timeout of the chunk queue; a held chunk's visibility is extended well before it runs out.
+const visibilityTimeoutSeconds = parseInt(process.env.CHUNK_VISIBILITY_TIMEOUT_SECONDS || "1800", 10);
+const imageModelId = "us.anthropic.claude-3-5-sonnet-20241022-v2:0";
+// Provisioned Throughput for the image model, when one has been purchased. Batch jobs keep using the model ID.
+const provisionedImageModelArn = process.env.BEDROCK_PROVISIONED_IMAGE_MODEL_ARN;
+
+// Number of on-demand image alt text requests kept in flight at once.
+const maxConcurrency = parseInt(process.env.BEDROCK_MAX_CONCURRENCY || "10", 10);
+// Number of images described together in one on-demand request.
+const imagesPerRequest = parseInt(process.env.BEDROCK_BATCH_SIZE || "4", 10);
+// Volume shared with the autotag container, which copies its outputs there under their S3 keys
+const sharedDir = process.env.SHARED_DIR;
+
 function sleep(ms) {
     return new Promise(resolve => setTimeout(resolve, ms));
 }
 
+/**
+ * Calls an async function, retrying failures with exponential backoff and full jitter.
+ * 
+ * @param {Function} fn - The async function to call.
+ * @param {number} [attempts=3] - The maximum number of attempts.
+ * @param {number} [baseDelayMs=1000] - The base delay used for the backoff.
+ * @returns {Promise<*>} - A promise that resolves with the function's result.
+ * @throws {Error} - Throws the last error once all attempts have failed.
+ */
+async function withRetry(fn, attempts = 3, baseDelayMs = 1000) {
+    for (let attempt = 1; ; attempt++) {
+        try {
+            return await fn();
+        } catch (error) {
+            if (attempt >= attempts) {
+                throw error;
+            }
+            await sleep(Math.random() * baseDelayMs * 2 ** attempt);
+        }
+    }
+}
 
 /**
- * Invokes the Bedrock AI model to generate alt text for a given image.
- * The image is provided as a buffer, which is converted to a base64-encoded string and included in the request payload.
- * The function sends the request to the model and returns the generated alt text.
+ * Runs an async function over a list of items with at most `limit` calls in flight.
  * 
- * @param {string} [prompt="generate alt text for this image"] - The prompt to guide the model in generating the alt text.
- * @param {Buffer} [imageBuffer=null] - The buffer containing the image data.
- * @param {string} [modelId="anthropic.claude-3-5-sonnet-20241022-v2:0"] - The ID of the Bedrock model to be used.
- * @returns {Promise<Object>} - A promise that resolves with the model's response, including the generated alt text.
- * @throws {Error} - Throws an error if invoking the model fails.
+ * @param {Array} items - The items to process.
+ * @param {number} limit - The maximum number of concurrent calls.
+ * @param {Function} fn - The async function called with each item.
+ * @returns {Promise<void>} - A promise that resolves when every item has been processed.
  */
-const invokeModel = async (
-    prompt = "generate alt text for this image",
-    imageBuffer = null,
-    modelId = "us.anthropic.claude-3-5-sonnet-20241022-v2:0",
-) => {
-    // Create a new Bedrock Runtime client instance.
-    const client = new BedrockRuntimeClient({ region: "us-east-1" });
-    const model_arn_image = process.env.model_arn_image;
-    
-    // Convert the image buffer to a base64-encoded string
-    const inputImageBase64 = imageBuffer ? imageBuffer.toString('base64') : null;
+async function mapWithConcurrency(items, limit, fn) {
+    let next = 0;
+    const workers = Array.from({ length: Math.min(limit, items.length) }, async () => {
+        while (next < items.length) {
+            await fn(items[next++]);
+        }
+    });
+    await Promise.all(workers);
+}
 
-    // Prepare the payload for the model.
-    const body = {
+
+/**
+ * Builds the Anthropic messages payload for an image prompt.
+ * Each image is preceded by a text block with its ID so the model can key its answer by image.
+ * Shared by the on-demand InvokeModel call and the batch inference records.
+ * 
+ * @param {string} prompt - The prompt to guide the model in generating the alt text.
+ * @param {Object[]} [images=[]] - The images to include, each with an `id` and the image data in `buffer`.
+ * @returns {Object} - The request body for the model.
+ */
+function buildImageRequestBody(prompt, images = []) {
+    const imageContent = images.flatMap(({ id, buffer }) => [
+        {
+            type: "text",
+            text: `Image ID: ${id}`,
+        },
+        {
+            type: "image",
+            source: {
+                type: "base64",
+                media_type: "image/png", 
+                // Convert the image buffer to a base64-encoded string
+                data: buffer.toString('base64'),
+            },
+        },
+    ]);
+
+    return {
         anthropic_version: "bedrock-2023-05-31",
         max_tokens: 2000,
         temperature: 0,
@@ -90,18 +161,7 @@ const invokeModel = async (
             {
                 role: "user",
                 content: [
-                    ...(inputImageBase64
-                        ? [
-                            {
-                                type: "image",
-                                source: {
-                                    type: "base64",
-                                    media_type: "image/png", 
-                                    data: inputImageBase64,
-                                },
-                            },
-                        ]
-                        : []),
+                    ...imageContent,
                     {
                         type: "text",
                         text: prompt,
@@ -110,12 +170,38 @@ const invokeModel = async (
             },
         ],
     };
+}
+
+/**
+ * Invokes the Bedrock AI model to generate alt text for the given images.
+ * The images are provided as buffers, which are converted to base64-encoded strings and included in the request payload.
+ * The function sends the request to the model and returns the generated alt text.
+ * 
+ * @param {string} [prompt="generate alt text for this image"] - The prompt to guide the model in generating the alt text.
+ * @param {Object[]} [images=[]] - The images to include, each with an `id` and the image data in `buffer`.
+ * @param {string} [modelId="anthropic.claude-3-5-sonnet-20241022-v2:0"] - The ID of the Bedrock model to be used.
+ * @returns {Promise<Object>} - A promise that resolves with the model's response, including the generated alt text.
+ * @throws {Error} - Throws an error if invoking the model fails.
+ */
+const invokeModel = async (
+    prompt = "generate alt text for this image",
+    images = [],
+    modelId = provisionedImageModelArn || imageModelId,
+) => {
+    // Create a new Bedrock Runtime client instance.
+    const client = new BedrockRuntimeClient({ region: "us-east-1" });
+    const model_arn_image = process.env.model_arn_image;
+
+    // Prepare the payload for the model.
+    const body = buildImageRequestBody(prompt, images);
 
     // Invoke the model with the payload and wait for the response.
     const command = new InvokeModelCommand({
         contentType: "application/json",
         body: JSON.stringify(body),
         modelId,
+        // Latency-optimized inference is an on-demand option
+        ...(modelId === provisionedImageModelArn ? {} : performanceConfigParams),
     });
     const apiResponse = await client.send(command);
 
@@ -126,17 +212,36 @@ const invokeModel = async (
 };
 
 /**
- * Generates WCAG 2.1-compliant alt text for an image based on its content and the provided prompt.
- * The function calls the Bedrock AI model to get a description formatted as JSON.
+ * Generates WCAG 2.1-compliant alt text for a group of images based on their content and the provided prompt.
+ * The images go to the Bedrock AI model in a single request, which returns one JSON object keyed by image ID.
  * 
- * @param {Object} imageObject - Contains metadata about the image, such as its ID.
- * @param {Buffer} imageBuffer - The buffer containing the image data.
+ * @param {Object[]} images - The images to describe, each with an `id` and the image data in `buffer`.
  * @returns {Promise<string>} - A promise that resolves with the generated alt text in JSON format.
  * @throws {Error} - Throws an error if generating the alt text fails.
  */
-async function generateAltText(imageObject, imageBuffer) {
-    const prompt = `Generate WCAG 2.1-compliant alt text for an image embedded in a PDF document. The output must be in strict JSON format as follows:
-    {“${imageObject.id}“: “Alternative text”}
+async function generateAltText(images) {
+    const prompt = buildAltTextPrompt(images);
+
+    try {
+        const response = await invokeModel(prompt, images);
+        
+        return response.content[0].text;
+    } catch (error) {
+      
+        throw error;
+    }
+}
+
+/**
+ * Builds the WCAG 2.1 alt text prompt for one or more images, asking for a JSON object keyed by image ID.
+ * 
+ * @param {Object[]} imageObjects - Contains metadata about each image, such as its ID.
+ * @returns {string} - The prompt text.
+ */
+function buildAltTextPrompt(imageObjects) {
+    const outputFormat = imageObjects.map(imageObject => `“${imageObject.id}“: “Alternative text”`).join(', ');
+    return `Generate WCAG 2.1-compliant alt text for each image embedded in a PDF document. Each image is preceded by its image ID. The output must be in strict JSON format as follows, with one entry per image:
+    {${outputFormat}}
     Follow these guidelines to create appropriate and effective alt text:
     1. Image Description:
        - Describe the key elements of the image, including objects, people, scenes, and any visible text.
@@ -166,15 +271,125 @@ async function generateAltText(imageObject, imageBuffer) {
     - Do not use unnecessary phrases like “Certainly!” or “Here’s the alt text:”
     - If you’re unsure about specific details, focus on describing what you can clearly determine from the context provided
     Now, based on the information given and these guidelines, generate the appropriate alt text in the required JSON format.`;
+}
 
-    try {
-        const response = await invokeModel(prompt, imageBuffer);
-        
-        return response.content[0].text;
-    } catch (error) {
-      
-        throw error;
+/**
+ * Reads an S3 object into a buffer.
+ * When the autotag container already left a copy in the shared task volume (SHARED_DIR), under this chunk's
+ * prefix (SHARED_PREFIX, the id of the autotag chunk message), that copy is used instead.
+ * 
+ * @param {string} bucketName - The name of the S3 bucket.
+ * @param {string} key - The key (path) of the object in the S3 bucket.
+ * @returns {Promise<Buffer>} - A promise that resolves with the object contents.
+ */
+async function getObjectBuffer(bucketName, key) {
+    const sharedPrefix = process.env.SHARED_PREFIX;
+    if (sharedDir && sharedPrefix) {
+        const sharedPath = path.join(sharedDir, sharedPrefix, key);
+        if (fs_1.existsSync(sharedPath)) {
+            // Each shared copy is read once, so remove it to keep the volume from filling up across chunks
+            const data = await fs.readFile(sharedPath);
+            await fs.unlink(sharedPath).catch(() => {});
+            return data;
+        }
+    }
+    const { Body } = await s3Client.send(new GetObjectCommand({ Bucket: bucketName, Key: key }));
+
+    // Stream the body contents to a buffer
+    const chunks = [];
+    await pipeline(Body, async function* (source) {
+        for await (const chunk of source) {
+            chunks.push(chunk);
+        }
+    });
+    return Buffer.concat(chunks);
+}
+
+/**
+ * Reads an extracted image (shared volume or S3) into memory.
+ * Nothing is written to local disk, so a long-running worker does not accumulate files across chunks.
+ * 
+ * @param {string} bucketName - The name of the S3 bucket.
+ * @param {Object} imageObject - Contains the image ID and its S3 path.
+ * @returns {Promise<Buffer>} - A promise that resolves with the image data.
+ */
+async function readImageBuffer(bucketName, imageObject) {
+    return getObjectBuffer(bucketName, imageObject.path);
+}
+
+/**
+ * Generates alt text for all images of a chunk with a single Bedrock batch inference job.
+ * The prompts are staged as JSONL in S3, one record per image, and the job output is read back
+ * once the job finishes. Used for image-heavy chunks instead of one InvokeModel call per image.
+ * 
+ * @param {Object[]} imageObjects - The images to describe, each with an ID and S3 path.
+ * @param {string} bucketName - The name of the S3 bucket.
+ * @param {string} filebasename - The base name of the file being processed.
+ * @returns {Promise<Object>} - A promise that resolves with an object mapping image IDs to alt text.
+ * @throws {Error} - Throws an error if the job fails or does not finish within the allowed wait time.
+ */
+async function generateAltTextBatch(imageObjects, bucketName, filebasename) {
+    const client = new BedrockClient({ region: "us-east-1" });
+    const chunkName = path.basename(process.env.S3_FILE_KEY, '.pdf');
+    const batchPrefix = `temp/${filebasename}/bedrock_batch/${chunkName}`;
+    const inputKey = `${batchPrefix}/input/records.jsonl`;
+    const outputPrefix = `${batchPrefix}/output/`;
+
+    const records = [];
+    for (const imageObject of imageObjects) {
+        const imageBuffer = await readImageBuffer(bucketName, imageObject);
+        records.push(JSON.stringify({
+            recordId: imageObject.id,
+            modelInput: buildImageRequestBody(buildAltTextPrompt([imageObject]), [{ id: imageObject.id, buffer: imageBuffer }]),
+        }));
+    }
+    await s3Client.send(new PutObjectCommand({
+        Bucket: bucketName,
+        Key: inputKey,
+        Body: records.join('\n'),
+    }));
+
+    const { jobArn } = await client.send(new CreateModelInvocationJobCommand({
+        jobName: `alt-text-${Date.now()}-${Math.random().toString(36).slice(2, 8)}`,
+        roleArn: batchRoleArn,
+        modelId: imageModelId,
+        inputDataConfig: { s3InputDataConfig: { s3Uri: `s3://${bucketName}/${inputKey}` } },
+        outputDataConfig: { s3OutputDataConfig: { s3Uri: `s3://${bucketName}/${outputPrefix}` } },
+    }));
+    logger.info(`Filename: ${filebasename} | Submitted batch inference job ${jobArn} for ${records.length} images`);
+
+    const deadline = Date.now() + batchMaxWaitSeconds * 1000;
+    const terminalStatuses = ['Completed', 'PartiallyCompleted', 'Failed', 'Stopped', 'Expired'];
+    let status = 'Submitted';
+    while (!terminalStatuses.includes(status)) {
+        if (Date.now() > deadline) {
+            await client.send(new StopModelInvocationJobCommand({ jobIdentifier: jobArn }));
+            throw new Error(`Batch inference job ${jobArn} did not finish within ${batchMaxWaitSeconds}s`);
+        }
+        await sleep(30000);
+        ({ status } = await client.send(new GetModelInvocationJobCommand({ jobIdentifier: jobArn })));
+        logger.info(`Filename: ${filebasename} | Batch inference job status: ${status}`);
+    }
+    if (status !== 'Completed' && status !== 'PartiallyCompleted') {
+        throw new Error(`Batch inference job ${jobArn} ended with status ${status}`);
+    }
+
+    // Output records are written to <output prefix>/<job id>/<input file name>.out
+    const jobId = jobArn.split('/').pop();
+    const output = await getObjectBuffer(bucketName, `${outputPrefix}${jobId}/records.jsonl.out`);
+    const results = {};
+    for (const line of output.toString('utf8').split('\n')) {
+        if (!line.trim()) {
+            continue;
+        }
+        try {
+            const record = JSON.parse(line);
+            Object.assign(results, JSON.parse(record.modelOutput.content[0].text));
+        } catch (error) {
+            logger.info(`Filename: ${filebasename} | Skipping batch record: ${error}`);
+        }
     }
+    return results;
 }
 
 
@@ -214,6 +429,7 @@ const invokeModel_alt_text_links = async (
         contentType: "application/json",
         body: JSON.stringify(body),
         modelId,
+        ...performanceConfigParams,
     });
 
     try {
@@ -256,30 +472,20 @@ async function generateAltTextForLink(url) {
  * @throws {Error} - Throws an error if any step in the PDF processing or S3 operations fails.
  */
 async function modifyPDF(zipped, bucketName, inputKey, outputKey, filebasename) {
-    const downloadPath = path.join('/tmp', path.basename(inputKey)); // Download to /tmp directory
-
     try {
-        // Step 1: Download the PDF file from S3 to a local path
-        const downloadParams = {
-           Bucket: process.env.S3_BUCKET_NAME,
-            Key: `temp/${filebasename}/output_autotag/COMPLIANT_${process.env.S3_FILE_KEY.split("/").pop()}`,
-        };
-        const pdfData = await s3Client.send(new GetObjectCommand(downloadParams));
-
-        // Stream the data to a file
-        const writeStream = fs_1.createWriteStream(downloadPath);
-        pdfData.Body.pipe(writeStream);
-
-        await new Promise((resolve, reject) => {
-            writeStream.on('finish', resolve);
-            writeStream.on('error', reject);
-        });
-
-        // Step 2: Read the downloaded PDF file
-        const pdfBytes = fs_1.readFileSync(downloadPath);
+        // Step 1: Fetch the autotagged PDF (shared volume or S3). The PDF is handled in memory throughout,
+        // so a failed chunk leaves no local files behind in a long-running worker.
+        const pdfBytes = await getObjectBuffer(
+            process.env.S3_BUCKET_NAME,
+            `temp/${filebasename}/output_autotag/COMPLIANT_${process.env.S3_FILE_KEY.split("/").pop()}`
+        );
+
+        // Step 2: Load the PDF
         const pdfDoc = await PDFDocument.load(pdfBytes);
 
         const linkProcessingPromises = [];
+        // The same URL is often linked many times in a document; generate its alt text once
+        const linkAltTexts = new Map();
 
         // Process the PDF
         pdfDoc.context.enumerateIndirectObjects().forEach(([pdfRef, pdfObject]) => {
@@ -287,22 +493,19 @@ async function modifyPDF(zipped, bucketName, inputKey, outputKey, filebasename)
                 const structType = pdfObject.lookup(PDFName.of('S'))?.encodedName;
 
                 if (structType === '/Figure') {
-                    Object.entries(zipped).forEach(([key, value]) => {
-                        if (key == pdfRef.objectNumber) {
-                            if (value === 'artifact') {
-                             
-                                pdfObject.set(PDFName.of('S'), PDFName.of('Artifact'));
-                            } else {
-                                logger.info(`Filename: ${filebasename} | Adding the alt text`);
-                        
-                                const newAltText = value;
-                                pdfObject.set(PDFName.of('Alt'), PDFString.of(newAltText));
-                                pdfObject.set(PDFName.of('Contents'), PDFString.of(newAltText));
-                                delete zipped[key];
-                                logger.info(`Filename: ${filebasename} | Alt text added:${newAltText}`);
-                            }
-                        }
-                    });
+                    // zipped is keyed by object number, so each figure is a direct lookup
+                    const value = zipped[pdfRef.objectNumber];
+                    if (value === 'artifact') {
+                        pdfObject.set(PDFName.of('S'), PDFName.of('Artifact'));
+                    } else if (value !== undefined) {
+                        logger.info(`Filename: ${filebasename} | Adding the alt text`);
+
+                        const newAltText = value;
+                        pdfObject.set(PDFName.of('Alt'), PDFString.of(newAltText));
+                        pdfObject.set(PDFName.of('Contents'), PDFString.of(newAltText));
+                        delete zipped[pdfRef.objectNumber];
+                        logger.info(`Filename: ${filebasename} | Alt text added:${newAltText}`);
+                    }
                 }
                 if (pdfObject.has(PDFName.of('Type')) && pdfObject.lookup(PDFName.of('Type')).encodedName === '/Annot') {
                     const subType = pdfObject.lookup(PDFName.of('Subtype'))?.encodedName;
@@ -312,7 +515,10 @@ async function modifyPDF(zipped, bucketName, inputKey, outputKey, filebasename)
 
                         if (url) {
                             console.log(`Processing URL: ${url}`);
-                            const altTextPromise = generateAltTextForLink(url).then((altText) => {
+                            if (!linkAltTexts.has(url)) {
+                                linkAltTexts.set(url, generateAltTextForLink(url));
+                            }
+                            const altTextPromise = linkAltTexts.get(url).then((altText) => {
                                 pdfObject.set(PDFName.of('Alt'), PDFString.of(altText));
                                 pdfObject.set(PDFName.of('Contents'), PDFString.of(altText));
                             });
@@ -326,26 +532,20 @@ async function modifyPDF(zipped, bucketName, inputKey, outputKey, filebasename)
             
         });
         await Promise.all(linkProcessingPromises);
-        // Step 3: Save the modified PDF locally
+        // Step 3: Serialize the modified PDF
         const modifiedPdfBytes = await pdfDoc.save();
-        const modifiedPdfPath = path.join('/tmp', 'modified_' + path.basename(inputKey));
-        fs_1.writeFileSync(modifiedPdfPath, modifiedPdfBytes);
 
         // Step 4: Upload the modified PDF back to S3
         const uploadParams = {
             Bucket: bucketName,
             Key: `temp/${filebasename}/FINAL_${outputKey}`,
-            Body: fs_1.createReadStream(modifiedPdfPath),
+            Body: modifiedPdfBytes,
             ContentType: 'application/pdf'
         };
         await s3Client.send(new PutObjectCommand(uploadParams));
 
         logger.info(`PDF modification complete. Output saved to s3://${bucketName}/FINAL_${outputKey}`);
 
-        // Clean up: Remove the local files if needed
-        fs_1.unlinkSync(downloadPath);
-        fs_1.unlinkSync(modifiedPdfPath);
-
     } catch (err) {
         console.error(`Filename: ${filebasename} | Error processing PDF: ${err}`);
     }
@@ -368,25 +568,8 @@ async function startProcess() {
     logger.info(`Filename: ${filebasename} | Text File Key: ${textFileKey}, Bucket Name: ${bucketName}`);
     try {
    
-        const getObjectParams = {
-            Bucket: bucketName,
-            Key: `temp/${textFileKey}`,
-        };
-        const command = new GetObjectCommand(getObjectParams);
-        const { Body } = await s3Client.send(command);
-
-        // Stream the body contents to a buffer
-        const chunks = [];
-        await pipeline(Body, async function* (source) {
-            for await (const chunk of source) {
-                chunks.push(chunk);
-            }
-        });
-        logger.info(`Filename: ${filebasename} | Chunks:${chunks}`);
-        const fileBuffer = Buffer.concat(chunks);
-        const localFilePath = path.join(__dirname, `temp_images_data.txt`);
-        fs_1.writeFileSync(localFilePath, fileBuffer);
-        const data = await fs.readFile('temp_images_data.txt', 'utf8');
+        const fileBuffer = await getObjectBuffer(bucketName, `temp/${textFileKey}`);
+        const data = fileBuffer.toString('utf8');
         const lines = data.split('\n');
         const splitLines = lines.map(line => line.split(' '));
         splitLines.pop();
@@ -398,34 +581,35 @@ async function startProcess() {
 
         let combinedResults = {};
 
-        for (const imageObject of imageObjects) {
+        // Image-heavy chunks go through one batch inference job; anything it misses falls back to on-demand calls
+        if (batchRoleArn && imageObjects.length >= batchThreshold) {
             try {
-                const getObjectParams = {
-                    Bucket: bucketName,
-                    Key: imageObject.path,
-                };
-                const command = new GetObjectCommand(getObjectParams);
-                const { Body } = await s3Client.send(command);
-        
-                // Stream the body contents to a buffer
-                const chunks = [];
-                await pipeline(Body, async function* (source) {
-                    for await (const chunk of source) {
-                        chunks.push(chunk);
-                    }
-                });
-                const fileBuffer = Buffer.concat(chunks);
-                const localFilePath = path.join(__dirname, `${imageObject.path.split('/').pop()}`);
-                fs_1.writeFileSync(localFilePath, fileBuffer);
-                const image_Buffer = await fs.readFile(localFilePath);
-                const response = await generateAltText(imageObject, image_Buffer);
+                combinedResults = await generateAltTextBatch(imageObjects, bucketName, filebasename);
+            } catch (error) {
+                logger.info(`Filename: ${filebasename} | Batch inference failed, using on-demand calls: ${error}`);
+            }
+        }
+
+        // Describe the remaining images in groups of imagesPerRequest per call, several calls at a time,
+        // with retries absorbing throttling
+        const pendingImages = imageObjects.filter(imageObject => !combinedResults.hasOwnProperty(imageObject.id));
+        const imageGroups = [];
+        for (let i = 0; i < pendingImages.length; i += imagesPerRequest) {
+            imageGroups.push(pendingImages.slice(i, i + imagesPerRequest));
+        }
+        await mapWithConcurrency(imageGroups, maxConcurrency, async (imageGroup) => {
+            try {
+                const images = await Promise.all(imageGroup.map(async (imageObject) => ({
+                    id: imageObject.id,
+                    buffer: await readImageBuffer(bucketName, imageObject),
+                })));
+                const response = await withRetry(() => generateAltText(images));
                 logger.info(`Filename: ${filebasename} | Response:${response}`);
                 Object.assign(combinedResults, JSON.parse(response));
             } catch (error) {
                 logger.info(`Filename: ${filebasename} | Error: ${error}`);
             }
-            await sleep(3000);
-        }
+        });
 
         let defaultText = "No text available"; 
 
@@ -446,12 +630,170 @@ async function startProcess() {
         logger.info(`Filename: ${filebasename} | PDF modification complete`);
 
     } catch (error) {
-        logger.info(`File: ${filebasename}, Status: Error in second ECS task`);
+        // Status lines are plain JSON so Logs Insights and the status metric filter can read their fields
+        console.log(JSON.stringify({ file: filebasename, status: "Error in second ECS task" }));
         logger.error(`Filename: ${filebasename} | Error processing images: ${error}`);
-        process.exit(1);
+        throw error;
     }
 }
 
+/**
+ * Sends a chunk's result to Step Functions, logging instead of throwing when the callback fails,
+ * e.g. because the execution timed out or was stopped and the task token is no longer valid.
+ * 
+ * @param {SFNClient} sfnClient - The Step Functions client.
+ * @param {Object} command - The SendTaskSuccessCommand or SendTaskFailureCommand to send.
+ * @param {string} s3Key - The chunk's S3 key, for logging.
+ * @returns {Promise<void>}
+ */
+async function reportTaskResult(sfnClient, command, s3Key) {
+    try {
+        await sfnClient.send(command);
+    } catch (error) {
+        logger.info(`Filename: ${s3Key} | Could not report the chunk result: ${error}`);
+    }
+}
+
+/**
+ * Deletes a handled chunk message, logging instead of throwing on failure.
+ * 
+ * @param {SQSClient} sqsClient - The SQS client.
+ * @param {string} queueUrl - The URL of the queue the message came from.
+ * @param {Object} message - The received message.
+ * @param {string} s3Key - The chunk's S3 key, for logging.
+ * @returns {Promise<void>}
+ */
+async function deleteMessage(sqsClient, queueUrl, message, s3Key) {
+    try {
+        await sqsClient.send(new DeleteMessageCommand({ QueueUrl: queueUrl, ReceiptHandle: message.ReceiptHandle }));
+    } catch (error) {
+        logger.info(`Filename: ${s3Key} | Could not delete the chunk message: ${error}`);
+    }
+}
+
+/**
+ * Parses and validates the body of a chunk message.
+ * 
+ * @param {Object} message - The received message.
+ * @returns {Object} - The message body, with at least task_token, s3_bucket and s3_key.
+ * @throws {Error} - Throws an error if the body is not a chunk message.
+ */
+function parseChunkMessage(message) {
+    const body = JSON.parse(message.Body);
+    if (!body || typeof body !== 'object'
+        || !['task_token', 's3_bucket', 's3_key'].every(field => typeof body[field] === 'string')) {
+        throw new Error('chunk message needs task_token, s3_bucket and s3_key');
+    }
+    if (body.s3_key.split('/').length < 3) {
+        throw new Error(`unexpected chunk key ${body.s3_key}`);
+    }
+    return body;
+}
 
+/**
+ * Long-running worker loop. Each message is a chunk forwarded by the autotag worker together with the
+ * Step Function task token, which is used to report the chunk's result.
+ * 
+ * @param {string} queueUrl - The URL of the alt text queue to consume.
+ * @returns {Promise<void>} - Never resolves; the worker runs until the task is stopped.
+ */
+async function runWorker(queueUrl) {
+    const sqsClient = new SQSClient({ region: "us-east-1" });
+    const sfnClient = new SFNClient({ region: "us-east-1" });
+    let inFlightReceiptHandle = null;
+
+    // Fargate Spot sends SIGTERM before reclaiming the task; hand the chunk back to the queue right away
+    // instead of leaving it invisible until the visibility timeout runs out
+    process.on('SIGTERM', async () => {
+        if (inFlightReceiptHandle) {
+            await sqsClient.send(new ChangeMessageVisibilityCommand({
+                QueueUrl: queueUrl,
+                ReceiptHandle: inFlightReceiptHandle,
+                VisibilityTimeout: 0,
+            })).catch(() => {});
+        }
+        process.exit(0);
+    });
 
-startProcess();
+    while (true) {
+        let Messages;
+        try {
+            ({ Messages } = await sqsClient.send(new ReceiveMessageCommand({
+                QueueUrl: queueUrl,
+                MaxNumberOfMessages: 1,
+                WaitTimeSeconds: 20,
+            })));
+        } catch (error) {
+            // Transient AWS errors must not end the worker; try again after a short pause
+            logger.info(`Could not receive chunks: ${error}`);
+            await sleep(5000);
+            continue;
+        }
+        for (const message of Messages || []) {
+            let body;
+            try {
+                body = parseChunkMessage(message);
+            } catch (error) {
+                // Hand the message straight back so it reaches the DLQ after its last receive, instead of
+                // ending the worker or waiting out the visibility timeout on every receive
+                logger.info(`Skipping malformed chunk message ${message.MessageId}: ${error}`);
+                await sqsClient.send(new ChangeMessageVisibilityCommand({
+                    QueueUrl: queueUrl,
+                    ReceiptHandle: message.ReceiptHandle,
+                    VisibilityTimeout: 0,
+                })).catch((releaseError) => logger.info(`Could not release chunk message ${message.MessageId}: ${releaseError}`));
+                continue;
+            }
+            // startProcess and its helpers read the chunk from the environment
+            process.env.S3_BUCKET_NAME = body.s3_bucket;
+            process.env.S3_FILE_KEY = body.s3_key;
+            process.env.SHARED_PREFIX = body.shared_prefix || '';
+            try {
+                inFlightReceiptHandle = message.ReceiptHandle;
+                // Keep the chunk invisible to other workers for as long as this worker holds it,
+                // e.g. while it polls a batch inference job
+                const heartbeat = setInterval(() => {
+                    sqsClient.send(new ChangeMessageVisibilityCommand({
+                        QueueUrl: queueUrl,
+                        ReceiptHandle: message.ReceiptHandle,
+                        VisibilityTimeout: visibilityTimeoutSeconds,
+                    })).catch((error) => logger.info(`Could not extend chunk visibility: ${error}`));
+                }, visibilityTimeoutSeconds * 1000 / 3);
+                try {
+                    await startProcess();
+                } finally {
+                    clearInterval(heartbeat);
+                    inFlightReceiptHandle = null;
+                    // Copies this chunk did not read (e.g. images without alt text) are not needed again
+                    if (sharedDir && body.shared_prefix) {
+                        await fs.rm(path.join(sharedDir, body.shared_prefix), { recursive: true, force: true })
+                            .catch((error) => logger.info(`Filename: ${body.s3_key} | Could not remove shared copies: ${error}`));
+                    }
+                }
+            } catch (error) {
+                await reportTaskResult(sfnClient, new SendTaskFailureCommand({
+                    taskToken: body.task_token,
+                    error: "AltTextFailed",
+                    cause: String(error).slice(0, 32768),
+                }), body.s3_key);
+                await deleteMessage(sqsClient, queueUrl, message, body.s3_key);
+                continue;
+            }
+            await reportTaskResult(sfnClient, new SendTaskSuccessCommand({
+                taskToken: body.task_token,
+                output: JSON.stringify({ s3_key: body.s3_key }),
+            }), body.s3_key);
+            await deleteMessage(sqsClient, queueUrl, message, body.s3_key);
+        }
+    }
+}
+
+if (process.env.CHUNK_QUEUE_URL) {
+    runWorker(process.env.CHUNK_QUEUE_URL).catch((error) => {
+        // Only reached on an unexpected error; exit so ECS replaces the task instead of leaving it hung
+        logger.error(`Chunk worker stopped: ${error}`);
+        process.exit(1);
+    });
+} else {
+    startProcess().catch(() => process.exit(1));
+}
@@ -123,10 +123,17 @@ def generate_title(extracted_text,current_title):
         ]
     }
 
+    # Request latency-optimized inference when it is enabled for the stack
+    converse_kwargs = {}
+    performance_config = os.environ.get('BEDROCK_PERFORMANCE_CONFIG')
+    if performance_config:
+        converse_kwargs['performanceConfig'] = {'latency': performance_config}
+
     # Send the request to the Converse API
     response = client.converse(
         modelId=model_id,
-        messages=request_payload['messages']
+        messages=request_payload['messages'],
+        **converse_kwargs
     )
 
     # Extract and return the generated title
@@ -12,6 +12,8 @@ from adobe.pdfservices.operation.pdfjobs.result.pdf_accessibility_checker_result
 from botocore.exceptions import ClientError
 import re
 
+COMPLIANT_FILE_NAME = re.compile(r"COMPLIANT_[^/]*")
+
 def create_json_output_file_path():
         os.makedirs("/tmp/PDFAccessibilityChecker", exist_ok=True)
         return f"/tmp/PDFAccessibilityChecker/result_after_remidiation.json"
@@ -84,10 +86,9 @@ def lambda_handler(event, context):
     print(f"s3_bucket: {s3_bucket}, save_path: {save_path}")
 
     # Extract file basename using regex
-    pattern = r"COMPLIANT_[^/]*"
-    match = re.search(pattern, save_path)
+    match = COMPLIANT_FILE_NAME.search(save_path)
     if not match:
-        raise ValueError(f"Pattern '{pattern}' not found in save_path: {save_path}")
+        raise ValueError(f"Pattern '{COMPLIANT_FILE_NAME.pattern}' not found in save_path: {save_path}")
     
     file_basename = match.group(0)
     print("File basename:", file_basename)
@@ -15,11 +15,11 @@ def create_json_output_file_path():
         os.makedirs("/tmp/PDFAccessibilityChecker", exist_ok=True)
         return f"/tmp/PDFAccessibilityChecker/result_before_remidiation.json"
 
-def download_file_from_s3(bucket_name,file_key, local_path):
+def download_file_from_s3(bucket_name,file_key, s3_key, local_path):
     s3 = boto3.client('s3')
-    print(f"Filename : {file_key} | File key in the function: {file_key}")
+    print(f"Filename : {file_key} | File key in the function: {s3_key}")
 
-    s3.download_file(bucket_name, f"pdf/{file_key}", local_path)
+    s3.download_file(bucket_name, s3_key, local_path)
 
     print(f"Filename : {file_key} | Downloaded {file_key} from {bucket_name} to {local_path}")
 
@@ -63,23 +63,39 @@ def get_secret(basefilename):
         print(f"Filename : {basefilename} | Unexpected error: {e}")
         raise  # Re-raise unexpected exceptions for debugging
      
+def needs_remediation(report_path):
+    """
+    Reads the Adobe accessibility report summary. Rules the checker can only flag for manual review
+    (e.g. logical reading order) are always present, so only failed rules count against the PDF.
+    """
+    with open(report_path) as report_file:
+        summary = json.load(report_file).get("Summary", {})
+    failed = summary.get("Failed", 0) + summary.get("Failed manually", 0)
+    return failed > 0, summary
+
+def copy_as_compliant(bucket_name, file_key, s3_key):
+    """
+    Publishes an already compliant upload to the result folder, where remediated files end up.
+    The upload is copied from its own key, which may be nested below pdf/; the result is named after the file.
+    """
+    s3 = boto3.client('s3')
+    save_path = f"result/COMPLIANT_{file_key}"
+    s3.copy_object(Bucket=bucket_name, CopySource={"Bucket": bucket_name, "Key": s3_key}, Key=save_path)
+    print(f"Filename : {file_key} | Already compliant, copied to {save_path}")
+    return save_path
 
 def lambda_handler(event, context):
     print("Received event:", event)
     s3_bucket = event.get('s3_bucket', None)
-    chunks = event.get('chunks', [])
-    if chunks:
-        first_chunk = chunks[0]
-        s3_key = first_chunk.get('s3_key', None)
-        if s3_key:
-            import os
-            file_basename = os.path.basename(s3_key)
-            file_basename = file_basename.split("_chunk_")[0] + os.path.splitext(file_basename)[1]
-            
+    s3_key = event.get('s3_key', None)
+    if not s3_bucket or not s3_key:
+        raise ValueError("Missing required inputs: 's3_bucket' or 's3_key'")
+    file_basename = os.path.basename(s3_key)
+
     print("File basename:", file_basename)
     print("s3_bucket:", s3_bucket)
     local_path = f"/tmp/{file_basename}"
-    download_file_from_s3(s3_bucket, file_basename, local_path)
+    download_file_from_s3(s3_bucket, file_basename, s3_key, local_path)
 
     try:
         pdf_file = open(local_path, 'rb')
@@ -116,9 +132,23 @@ def lambda_handler(event, context):
             file.write(stream_report.get_input_stream())
         bucket_save_path = save_to_s3(s3_bucket, file_basename)
         print(f"Filename : {file_basename} | Saved accessibility report to {bucket_save_path}")
+        remediate, summary = needs_remediation(output_file_path_json)
 
     except (ServiceApiException, ServiceUsageException, SdkException) as e:
+        # Without a report there is no evidence the PDF is compliant, so it goes through remediation
         print(f'Filename : {file_basename} | Exception encountered while executing operation: {e}')
-        return f"Filename : {file_basename} | Exception encountered while executing operation: {e}"
-    return f"Filename : {file_basename} | Saved accessibility report to {bucket_save_path}"
+        return {
+            "needs_remediation": True,
+            "message": f"Filename : {file_basename} | Exception encountered while executing operation: {e}",
+        }
+
+    print(f"Filename : {file_basename} | Report summary: {summary} | Needs remediation: {remediate}")
+    result = {
+        "needs_remediation": remediate,
+        "report_key": bucket_save_path,
+        "summary": summary,
+    }
+    if not remediate:
+        result["save_path"] = copy_as_compliant(s3_bucket, file_basename, s3_key)
+    return result
     
@@ -0,0 +1,41 @@
+"""
+This AWS Lambda function consumes the dead-letter queues of the chunk work queues. A chunk lands there once the
+workers have given up on it (e.g. after repeated OOM kills), and then no worker is left to answer its Step Functions
+task token. The function fails the token, so the execution fails right away with the chunk named in the error
+instead of waiting silently for its timeout.
+"""
+import json
+import boto3
+
+stepfunctions = boto3.client('stepfunctions')
+
+
+def lambda_handler(event, context):
+    """
+    Fails the Step Functions task of every dead-lettered chunk in the SQS batch.
+
+    Parameters:
+        event (dict): The SQS event, one record per dead-lettered chunk message.
+        context (object): The Lambda context object.
+    """
+    for record in event['Records']:
+        try:
+            body = json.loads(record['body'])
+        except ValueError:
+            print(f'Dead-lettered message {record["messageId"]} is not a chunk message')
+            continue
+        if not isinstance(body, dict) or 'task_token' not in body:
+            print(f'Dead-lettered message {record["messageId"]} has no task token')
+            continue
+        s3_key = body.get('s3_key', '')
+        file_base_name = s3_key.split('/')[1] if s3_key.count('/') >= 2 else s3_key
+        print(json.dumps({"file": file_base_name, "status": "Failed in chunk queue"}))
+        print(f'Filename - {s3_key} | Chunk was dead-lettered after repeated failed attempts')
+        try:
+            stepfunctions.send_task_failure(taskToken=body['task_token'],
+                                            error="ChunkDeadLettered",
+                                            cause=f"Chunk {s3_key} failed on every attempt and was moved to the dead-letter queue")
+        except (stepfunctions.exceptions.TaskTimedOut, stepfunctions.exceptions.InvalidToken,
+                stepfunctions.exceptions.TaskDoesNotExist):
+            # The execution has already ended, e.g. it timed out or was stopped
+            print(f'Filename - {s3_key} | Task token is no longer valid')
@@ -7,10 +7,17 @@ import com.amazonaws.services.s3.AmazonS3ClientBuilder;
 import com.amazonaws.services.s3.model.GetObjectRequest;
 import com.amazonaws.services.s3.model.PutObjectRequest;
 import org.apache.pdfbox.multipdf.PDFMergerUtility;
+import org.json.JSONArray;
+import org.json.JSONObject;
 import java.io.File;
 import java.io.IOException;
+import java.util.ArrayList;
 import java.util.List;
 import java.util.Map;
+import java.util.concurrent.ExecutionException;
+import java.util.concurrent.ExecutorService;
+import java.util.concurrent.Executors;
+import java.util.concurrent.Future;
 import java.util.stream.Collectors;
 
 
@@ -25,11 +32,15 @@ public class App implements RequestHandler<Map<String, Object>, String> {
 
     private final AmazonS3 s3Client = AmazonS3ClientBuilder.defaultClient();
 
+    /** Number of chunks downloaded from S3 at the same time. */
+    private static final int DOWNLOAD_THREADS = 8;
+
     /**
      * Handles the Lambda function request.
      *
      * @param input The input map containing the file names of PDFs to be merged.
-     *              The map should have a key "fileNames" with a list of S3 object keys.
+     *              The map should have a key "chunksManifestKey" with the S3 key of the chunk
+     *              manifest written by the split lambda, or a key "fileNames" with a list of S3 object keys.
      * @param context The context object provides methods and properties that provide
      *                information about the invocation, function, and execution environment.
      * @return A message indicating the success or failure of the PDF merging process.
@@ -39,8 +50,12 @@ public class App implements RequestHandler<Map<String, Object>, String> {
     public String handleRequest(Map<String, Object> input, Context context) {
         String bucketName = System.getenv("BUCKET_NAME"); // Replace with your S3 bucket name
 
-        // Extract the list of file names from the input
+        // Extract the list of file names from the input, reading them from the chunk manifest when one is given
         List<String> pdfKeys = (List<String>) input.get("fileNames");
+        String manifestKey = (String) input.get("chunksManifestKey");
+        if (manifestKey != null) {
+            pdfKeys = readChunkKeys(bucketName, manifestKey);
+        }
         if (pdfKeys == null || pdfKeys.isEmpty()) {
             return "No files to merge.";
         }
@@ -64,9 +79,7 @@ public class App implements RequestHandler<Map<String, Object>, String> {
 
         try {
             // Download PDFs from S3
-            for (String key : modifiedPdfKeys) {
-                downloadPDF(bucketName, key, baseFileName);
-            }
+            downloadPDFs(bucketName, modifiedPdfKeys, baseFileName);
 
             // Merge the PDFs
             mergePDFs(modifiedPdfKeys, mergedFilePath, baseFileName);
@@ -79,13 +92,59 @@ public class App implements RequestHandler<Map<String, Object>, String> {
             return String.format("PDFs merged successfully.\nBucket: %s\nMerged File Key: %s\nMerged File Name: %s", 
                              bucketName, outputKey, baseFileName);
         } catch (Exception e) {
-            baseFileName = baseFileName.replace(".pdf", "");
-            System.out.println("File: " + baseFileName + ", Status: Failed in Merging the PDF");
-            System.out.println(String.format("Filename: %s, File not found: %s", baseFileName, e.getMessage()));
+            System.out.println(statusLine(baseFileName, "Failed in Merging the PDF"));
+            System.out.println(String.format("Filename: %s, File not found: %s", baseFileName.replace(".pdf", ""), e.getMessage()));
             return "Failed to merge PDFs.";
         }
     }
 
+    /**
+     * Reads the S3 keys of the PDF chunks, in page order, from the chunk manifest in S3.
+     *
+     * @param bucketName The name of the S3 bucket.
+     * @param manifestKey The S3 object key of the chunk manifest.
+     * @return The list of S3 object keys of the chunks.
+     */
+    private List<String> readChunkKeys(String bucketName, String manifestKey) {
+        JSONArray chunks = new JSONArray(s3Client.getObjectAsString(bucketName, manifestKey));
+        List<String> keys = new ArrayList<>();
+        for (int i = 0; i < chunks.length(); i++) {
+            keys.add(chunks.getJSONObject(i).getString("s3_key"));
+        }
+        return keys;
+    }
+
+    /**
+     * Downloads PDF files from S3 to the local temporary directory in parallel.
+     *
+     * @param bucketName The name of the S3 bucket.
+     * @param keys The S3 object keys of the PDF files to download.
+     * @param baseFileName The base name of the file used for logging purposes.
+     * @throws IOException If any of the files could not be downloaded.
+     */
+    private void downloadPDFs(String bucketName, List<String> keys, String baseFileName) throws IOException {
+        ExecutorService executor = Executors.newFixedThreadPool(Math.min(DOWNLOAD_THREADS, keys.size()));
+        try {
+            List<Future<Void>> downloads = new ArrayList<>();
+            for (String key : keys) {
+                downloads.add(executor.submit(() -> {
+                    downloadPDF(bucketName, key, baseFileName);
+                    return null;
+                }));
+            }
+            for (Future<Void> download : downloads) {
+                download.get();
+            }
+        } catch (InterruptedException e) {
+            Thread.currentThread().interrupt();
+            throw new IOException("Interrupted while downloading chunks", e);
+        } catch (ExecutionException e) {
+            throw new IOException(e.getCause());
+        } finally {
+            executor.shutdownNow();
+        }
+    }
+
     /**
      * Downloads a PDF file from S3 to the local temporary directory.
      *
@@ -148,7 +207,18 @@ public class App implements RequestHandler<Map<String, Object>, String> {
      * @param baseFileName The base name of the file used for logging purposes.
      */
     private void logFileStatus(String baseFileName) {
-        baseFileName = baseFileName.replace(".pdf", "");
-        System.out.println(String.format("File: %s, Status: succeeded", baseFileName));
+        System.out.println(statusLine(baseFileName, "succeeded"));
+    }
+
+    /**
+     * Builds the file status line. It is logged as bare JSON so the FileStatus metric filter and the
+     * dashboard queries can parse it.
+     *
+     * @param baseFileName The base name of the file, with or without the .pdf extension.
+     * @param status The processing status of the file.
+     * @return The status line as a JSON object string.
+     */
+    static String statusLine(String baseFileName, String status) {
+        return new JSONObject().put("file", baseFileName.replace(".pdf", "")).put("status", status).toString();
     }
 }
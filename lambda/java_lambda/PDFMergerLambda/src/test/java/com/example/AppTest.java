@@ -3,6 +3,7 @@ package com.example;
 import junit.framework.Test;
 import junit.framework.TestCase;
 import junit.framework.TestSuite;
+import org.json.JSONObject;
 
 /**
  * Unit test for simple App.
@@ -35,4 +36,17 @@ public class AppTest
     {
         assertTrue( true );
     }
+
+    /**
+     * The status line must be bare JSON, or the FileStatus metric filter never matches it
+     */
+    public void testStatusLineIsJson()
+    {
+        String line = App.statusLine( "report.pdf", "succeeded" );
+        JSONObject status = new JSONObject( line );
+        assertEquals( "report", status.getString( "file" ) );
+        assertEquals( "succeeded", status.getString( "status" ) );
+        assertEquals( 2, status.length() );
+        assertTrue( line.startsWith( "{" ) );
+    }
 }
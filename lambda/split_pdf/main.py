@@ -6,7 +6,9 @@ The function performs the following operations:
 2. Splits the PDF into chunks of specified page size (for example, one page per chunk).
 3. Uploads each PDF chunk to a temporary location in the same S3 bucket.
 4. Logs the processing status of each chunk and its upload to S3.
-5. Starts an AWS Step Functions execution with metadata about the uploaded chunks.
+5. Writes a manifest of the uploaded chunks to S3 and starts an AWS Step Functions execution
+   with the manifest key, keeping the execution input the same size however many chunks there are.
+   The input also says whether the PDF is tagged; untagged PDFs skip the pre-remediation check.
 
 """
 import json
@@ -36,7 +38,7 @@ def log_chunk_created(filename):
     Returns:
         dict: HTTP response with a status code and a message indicating the metric update.
     """
-    print(f"File: {filename}, Status: Processing")
+    print(json.dumps({"file": filename, "status": "Processing"}))
     print(f'Filename - {filename} | Uploaded {filename} to S3')
    
     return {
@@ -60,7 +62,8 @@ def split_pdf_into_pages(source_content, original_key, s3_client, bucket_name, p
         pages_per_chunk (int): The number of pages per chunk.
 
     Returns:
-        list: A list of dictionaries containing metadata for each uploaded chunk.
+        tuple: A list of dictionaries containing metadata for each uploaded chunk, and whether
+               the PDF has a structure tree (is tagged).
     """
     from pypdf import PdfReader, PdfWriter
     
@@ -101,7 +104,7 @@ def split_pdf_into_pages(source_content, original_key, s3_client, bucket_name, p
             "chunk_key": s3_key  # Key for the chunk
         })
 
-    return chunks
+    return chunks, "/StructTreeRoot" in reader.trailer["/Root"]
 
 
 def lambda_handler(event, context):
@@ -143,20 +146,25 @@ def lambda_handler(event, context):
         pdf_file_content = response['Body'].read()
   
         # Split the PDF into pages and upload them to S3
-        chunks = split_pdf_into_pages(pdf_file_content, pdf_file_key, s3, bucket_name, 200)
+        chunks, is_tagged = split_pdf_into_pages(pdf_file_content, pdf_file_key, s3, bucket_name, 200)
         
         log_chunk_created(file_basename)
 
-        # Trigger Step Function with the list of chunks
+        # Write the chunk manifest that the Step Function's distributed map reads its items from
+        chunks_manifest_key = f"temp/{file_basename}/chunks.json"
+        s3.put_object(Bucket=bucket_name, Key=chunks_manifest_key, Body=json.dumps(chunks))
+
+        # Trigger Step Function with a pointer to the chunk manifest instead of the chunks themselves
         response = stepfunctions.start_execution(
             stateMachineArn=state_machine_arn,
-            input=json.dumps({"chunks": chunks, "s3_bucket": bucket_name})
+            input=json.dumps({"s3_bucket": bucket_name, "s3_key": pdf_file_key, "chunks_manifest_key": chunks_manifest_key,
+                              "is_tagged": is_tagged})
         )
         print(f"Filename - {pdf_file_key} | Step Function started: {response['executionArn']}")
 
     except KeyError as e:
  
-        print(f"File: {file_basename}, Status: Failed in split lambda function")
+        print(json.dumps({"file": file_basename, "status": "Failed in split lambda function"}))
         print(f"Filename - {pdf_file_key} | KeyError: {str(e)}")
         return {
             'statusCode': 500,
@@ -164,7 +172,7 @@ def lambda_handler(event, context):
         }
     except ValueError as e:
   
-        print(f"File: {file_basename}, Status: Failed in split lambda function")
+        print(json.dumps({"file": file_basename, "status": "Failed in split lambda function"}))
         print(f"Filename - {pdf_file_key} | ValueError: {str(e)}")
         return {
             'statusCode': 500,
@@ -172,7 +180,7 @@ def lambda_handler(event, context):
         }
     except Exception as e:
 
-        print(f"File: {file_basename}, Status: Failed in split lambda function")
+        print(json.dumps({"file": file_basename, "status": "Failed in split lambda function"}))
         print(f"Filename - {pdf_file_key} | Error occurred: {str(e)}", exc_info=True)
         return {
             'statusCode': 500,
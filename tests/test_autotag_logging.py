@@ -0,0 +1,45 @@
+"""
+The autotag container reports chunk status as JSON lines on stderr, which the CloudWatch metric filter and the
+dashboard's Logs Insights queries parse. These tests check the lines come out as bare JSON, without a logging prefix.
+"""
+import json
+import logging
+import os
+import sys
+
+import pytest
+
+pytest.importorskip("boto3")
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "docker_autotag"))
+import autotag  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def restore_root_logger():
+    root = logging.getLogger()
+    handlers, level = root.handlers[:], root.level
+    yield
+    root.handlers[:] = handlers
+    root.setLevel(level)
+
+
+def test_failure_status_line_is_json(monkeypatch, capsys):
+    # A handler installed before main() runs, as an imported library might do, must not keep its prefix format
+    logging.basicConfig(level=logging.INFO)
+
+    def fail(bucket_name, s3_file_key):
+        raise RuntimeError("boom")
+
+    monkeypatch.delenv("CHUNK_QUEUE_URL", raising=False)
+    monkeypatch.setenv("S3_BUCKET_NAME", "bucket")
+    monkeypatch.setenv("S3_FILE_KEY", "temp/report/report_chunk_1.pdf")
+    monkeypatch.setattr(autotag, "process_chunk", fail)
+
+    with pytest.raises(SystemExit):
+        autotag.main()
+
+    lines = capsys.readouterr().err.splitlines()
+    assert lines, "main() did not log through a handler it configured"
+    status = json.loads(lines[0])
+    assert status == {"file": "report", "status": "Failed in First ECS task"}
@@ -0,0 +1,35 @@
+"""
+A malformed chunk message must be rejected with ValueError, which the worker loop logs and skips, rather than raise
+something that ends the long-running worker.
+"""
+import json
+import os
+import sys
+
+import pytest
+
+pytest.importorskip("boto3")
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "docker_autotag"))
+import autotag  # noqa: E402
+
+
+def chunk_message(body):
+    return {"MessageId": "id", "ReceiptHandle": "handle", "Body": body}
+
+
+def test_parse_chunk_message():
+    body = {"task_token": "token", "s3_bucket": "bucket", "s3_key": "pdf/report/report_chunk_1.pdf"}
+    assert autotag.parse_chunk_message(chunk_message(json.dumps(body))) == body
+
+
+@pytest.mark.parametrize("body", [
+    "not json",
+    "[]",
+    json.dumps({"s3_bucket": "bucket", "s3_key": "pdf/report/report_chunk_1.pdf"}),
+    json.dumps({"task_token": "token", "s3_bucket": "bucket", "s3_key": 1}),
+    json.dumps({"task_token": "token", "s3_bucket": "bucket", "s3_key": "report_chunk_1.pdf"}),
+])
+def test_parse_chunk_message_rejects_malformed_bodies(body):
+    with pytest.raises(ValueError):
+        autotag.parse_chunk_message(chunk_message(body))